@@ -22,15 +22,25 @@ def main() -> None:
             print(f"Unable to open pairing window: {exc}")
 
     server = WindowsAgentServer(config=config, pairing_code=code)
+    services = [server.run]
+    if config.ipc_socket_path is not None:
+        services.append(server.run_ipc)
+    if server.loop_watchdog is not None:
+        services.append(server.loop_watchdog.run)
+    if server.injector is not None:
+        services.append(server.injector.run)
     if config.web_ui_enabled:
         ui_server = StaticUIHTTPServer(
             host=config.web_ui_host,
             port=config.web_ui_port,
             static_dir=Path(__file__).parent / "static",
+            metrics_provider=server.metrics,
+            max_connections=config.web_ui_max_connections,
+            max_connections_per_ip=config.web_ui_max_connections_per_ip,
+            request_timeout_s=config.web_ui_request_timeout_s,
         )
-        asyncio.run(run_services(server.run, ui_server.run))
-    else:
-        asyncio.run(server.run())
+        services.append(ui_server.run)
+    asyncio.run(run_services(*services))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Any
+
+REJECTED_TOTAL_LIMIT = "rejected_total_limit"
+REJECTED_PEER_LIMIT = "rejected_peer_limit"
+REJECTED_FRAME_TYPE = "frame_type"
+REJECTED_FRAME_SIZE = "frame_size"
+REJECTED_BUDGET = "budget"
+REJECTED_DECODE = "decode"
+REJECTED_ENVELOPE = "envelope"
+
+
+def peer_host(address: Any) -> str:
+    if isinstance(address, tuple) and address:
+        return str(address[0])
+    if isinstance(address, str) and address:
+        return address
+    return "local"
+
+
+class ConnectionLimiter:
+    def __init__(self, *, max_total: int, max_per_peer: int) -> None:
+        self.max_total = max_total
+        self.max_per_peer = max_per_peer
+        self.active = 0
+        self._per_peer: dict[str, int] = {}
+        self.counters: dict[str, int] = {
+            "accepted": 0,
+            REJECTED_TOTAL_LIMIT: 0,
+            REJECTED_PEER_LIMIT: 0,
+            "idle_closed": 0,
+            "unpaired_closed": 0,
+        }
+
+    def try_acquire(self, peer: str) -> str | None:
+        if self.max_total > 0 and self.active >= self.max_total:
+            self.counters[REJECTED_TOTAL_LIMIT] += 1
+            return REJECTED_TOTAL_LIMIT
+        if self.max_per_peer > 0 and self._per_peer.get(peer, 0) >= self.max_per_peer:
+            self.counters[REJECTED_PEER_LIMIT] += 1
+            return REJECTED_PEER_LIMIT
+        self.active += 1
+        self._per_peer[peer] = self._per_peer.get(peer, 0) + 1
+        self.counters["accepted"] += 1
+        return None
+
+    def release(self, peer: str) -> None:
+        remaining = self._per_peer.get(peer, 0) - 1
+        if remaining > 0:
+            self._per_peer[peer] = remaining
+        else:
+            self._per_peer.pop(peer, None)
+        self.active = max(0, self.active - 1)
+
+    def count(self, counter: str) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {"active": self.active, "peers": len(self._per_peer), **self.counters}
+
+
+class FrameBudget:
+    __slots__ = ("frames_per_sec", "tokens", "updated_at")
+
+    def __init__(self, frames_per_sec: float, now: float) -> None:
+        self.frames_per_sec = frames_per_sec
+        self.tokens = float(frames_per_sec)
+        self.updated_at = now
+
+    def consume(self, now: float) -> bool:
+        self.tokens = min(
+            self.frames_per_sec,
+            self.tokens + (now - self.updated_at) * self.frames_per_sec,
+        )
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class FrameGate:
+    # Layered admission for raw frames: type and size, then the connection's
+    # frame budget, all before json.loads. Decode and envelope failures are
+    # counted here too so /metrics shows where frames are being dropped.
+    def __init__(
+        self,
+        *,
+        max_frame_chars: int,
+        bound_frames_per_sec: float,
+        unbound_frames_per_sec: float,
+    ) -> None:
+        self.max_frame_chars = max_frame_chars
+        self.bound_frames_per_sec = bound_frames_per_sec
+        self.unbound_frames_per_sec = unbound_frames_per_sec
+        self.counters: dict[str, int] = {
+            REJECTED_FRAME_TYPE: 0,
+            REJECTED_FRAME_SIZE: 0,
+            REJECTED_BUDGET: 0,
+            REJECTED_DECODE: 0,
+            REJECTED_ENVELOPE: 0,
+        }
+
+    def budget(self, *, bound: bool, now: float) -> FrameBudget | None:
+        rate = self.bound_frames_per_sec if bound else self.unbound_frames_per_sec
+        return FrameBudget(rate, now) if rate > 0 else None
+
+    def check(self, raw: Any, budget: FrameBudget | None, now: float) -> str | None:
+        if not isinstance(raw, str):
+            rejected = REJECTED_FRAME_TYPE
+        elif self.max_frame_chars > 0 and len(raw) > self.max_frame_chars:
+            rejected = REJECTED_FRAME_SIZE
+        elif budget is not None and not budget.consume(now):
+            rejected = REJECTED_BUDGET
+        else:
+            return None
+        self.counters[rejected] += 1
+        return rejected
+
+    def count(self, counter: str) -> None:
+        self.counters[counter] += 1
+
+    def snapshot(self) -> dict:
+        return dict(self.counters)
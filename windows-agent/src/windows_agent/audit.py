@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO
+
+DEFAULT_AUDIT_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_AUDIT_MAX_SEGMENTS = 64
+INDEX_BLOCK_RECORDS = 256
+
+
+@dataclass(slots=True)
+class AuditSegment:
+    seq: int
+    log_path: Path
+    index_path: Path
+
+    @property
+    def compressed_path(self) -> Path:
+        return self.log_path.with_name(self.log_path.name + ".gz")
+
+    def open(self) -> IO[bytes]:
+        # Prefer the plain file: it still exists while compression is in flight.
+        try:
+            return self.log_path.open("rb")
+        except FileNotFoundError:
+            return gzip.open(self.compressed_path, "rb")
+
+    def remove(self) -> None:
+        for path in (self.log_path, self.compressed_path, self.index_path):
+            with contextlib.suppress(OSError):
+                path.unlink(missing_ok=True)
+
+
+def _segment(base_path: Path, seq: int) -> AuditSegment:
+    stem = f"{base_path.stem}.{seq:06d}"
+    return AuditSegment(
+        seq=seq,
+        log_path=base_path.with_name(stem + base_path.suffix),
+        index_path=base_path.with_name(stem + ".idx"),
+    )
+
+
+def list_segments(base_path: Path) -> list[AuditSegment]:
+    pattern = re.compile(
+        rf"^{re.escape(base_path.stem)}\.(\d{{6}}){re.escape(base_path.suffix)}(\.gz)?$"
+    )
+    seqs = set()
+    if base_path.parent.exists():
+        for path in base_path.parent.iterdir():
+            match = pattern.match(path.name)
+            if match:
+                seqs.add(int(match.group(1)))
+    return [_segment(base_path, seq) for seq in sorted(seqs)]
+
+
+def _compress_segment(segment: AuditSegment) -> None:
+    tmp_path = segment.compressed_path.with_name(segment.compressed_path.name + ".tmp")
+    try:
+        with segment.log_path.open("rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        # Retention may have removed the segment while it was being copied;
+        # publishing the .gz now would bring it back.
+        if not segment.log_path.exists():
+            tmp_path.unlink()
+            return
+        os.replace(tmp_path, segment.compressed_path)
+        # On Windows this fails while a query holds the file open; the next
+        # retention pass removes the leftover plain copy.
+        segment.log_path.unlink()
+    except OSError:
+        with contextlib.suppress(OSError):
+            tmp_path.unlink(missing_ok=True)
+
+
+def _compress_segments(segments: list[AuditSegment]) -> None:
+    for segment in segments:
+        _compress_segment(segment)
+
+
+def _seal_leftover(segment: AuditSegment) -> None:
+    # A segment left unsealed by an unclean shutdown: index the records after
+    # its last block and mark it sealed, so it can be compressed like any other.
+    blocks, sealed = _read_index(segment)
+    if sealed:
+        return
+    start = blocks[-1]["e"] if blocks else 0
+    with segment.log_path.open("rb") as f:
+        f.seek(start)
+        tail = f.read()
+    end = start + tail.rfind(b"\n") + 1
+    entries = []
+    if end > start:
+        timestamps = []
+        devices = set()
+        for record in _matching_records(
+            tail[: end - start], since=None, until=None, device_id=None
+        ):
+            timestamps.append(record.get("ts", 0.0))
+            if record.get("device_id") is not None:
+                devices.add(record["device_id"])
+        if timestamps:
+            entries.append(
+                {
+                    "o": start,
+                    "e": end,
+                    "t0": min(timestamps),
+                    "t1": max(timestamps),
+                    "d": sorted(devices),
+                }
+            )
+    with segment.index_path.open("a", encoding="utf-8") as index:
+        for entry in entries:
+            index.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        index.write(json.dumps({"sealed": True, "size": end}) + "\n")
+
+
+class SegmentedAuditLog(logging.Handler):
+    def __init__(
+        self,
+        base_path: Path,
+        *,
+        segment_bytes: int = DEFAULT_AUDIT_SEGMENT_BYTES,
+        max_segments: int = DEFAULT_AUDIT_MAX_SEGMENTS,
+        compress: bool = True,
+    ) -> None:
+        super().__init__()
+        self.base_path = base_path
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.compress = compress
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        existing = list_segments(base_path)
+        self._open_segment(existing[-1].seq + 1 if existing else 1)
+        # Segments from earlier runs were never rotated out by this process:
+        # seal them, apply retention, then compress whatever is kept.
+        for segment in existing:
+            if segment.log_path.exists():
+                with contextlib.suppress(OSError):
+                    _seal_leftover(segment)
+        self._apply_retention()
+        if compress:
+            leftover = [
+                segment
+                for segment in list_segments(base_path)
+                if segment.seq != self._segment.seq and segment.log_path.exists()
+            ]
+            if leftover:
+                threading.Thread(target=_compress_segments, args=(leftover,), daemon=True).start()
+
+    def _open_segment(self, seq: int) -> None:
+        self._segment = _segment(self.base_path, seq)
+        self._file = self._segment.log_path.open("ab")
+        self._index = self._segment.index_path.open("a", encoding="utf-8")
+        self._size = 0
+        self._reset_block()
+
+    def _reset_block(self) -> None:
+        self._block_offset = self._size
+        self._block_count = 0
+        self._block_t0 = 0.0
+        self._block_t1 = 0.0
+        self._block_devices: set[str] = set()
+
+    def _flush_block(self) -> None:
+        if not self._block_count:
+            return
+        entry = {
+            "o": self._block_offset,
+            "e": self._size,
+            "t0": self._block_t0,
+            "t1": self._block_t1,
+            "d": sorted(self._block_devices),
+        }
+        self._index.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._index.flush()
+        self._reset_block()
+
+    def _seal_segment(self) -> None:
+        self._flush_block()
+        self._index.write(json.dumps({"sealed": True, "size": self._size}) + "\n")
+        self._index.close()
+        self._file.close()
+
+    def _rotate(self) -> None:
+        sealed = self._segment
+        self._seal_segment()
+        self._open_segment(sealed.seq + 1)
+        if self.compress:
+            threading.Thread(target=_compress_segment, args=(sealed,), daemon=True).start()
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        segments = list_segments(self.base_path)
+        if self.max_segments > 0:
+            for segment in segments[: max(0, len(segments) - self.max_segments)]:
+                segment.remove()
+        for segment in segments:
+            if segment.log_path.exists() and segment.compressed_path.exists():
+                with contextlib.suppress(OSError):
+                    segment.log_path.unlink()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            device_id = getattr(record, "device_id", None)
+            entry = {
+                "ts": record.created,
+                "level": record.levelname,
+                "device_id": device_id,
+                "msg": record.getMessage(),
+            }
+            data = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+            if self._size and self._size + len(data) > self.segment_bytes:
+                self._flush_block()
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            if not self._block_count:
+                self._block_t0 = record.created
+            self._block_t1 = record.created
+            if device_id is not None:
+                self._block_devices.add(device_id)
+            self._size += len(data)
+            self._block_count += 1
+            if self._block_count >= INDEX_BLOCK_RECORDS:
+                self._flush_block()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            if not self._file.closed:
+                self._seal_segment()
+        finally:
+            self.release()
+        super().close()
+
+
+def _read_index(segment: AuditSegment) -> tuple[list[dict], bool]:
+    blocks: list[dict] = []
+    sealed = False
+    if not segment.index_path.exists():
+        return blocks, sealed
+    with segment.index_path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("sealed"):
+                sealed = True
+            else:
+                blocks.append(entry)
+    return blocks, sealed
+
+
+def _matching_records(
+    data: bytes, *, since: float | None, until: float | None, device_id: str | None
+) -> Iterator[dict]:
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        ts = record.get("ts", 0.0)
+        if since is not None and ts < since:
+            continue
+        if until is not None and ts > until:
+            continue
+        if device_id is not None and record.get("device_id") != device_id:
+            continue
+        yield record
+
+
+def query_audit(
+    base_path: Path,
+    *,
+    since: float | None = None,
+    until: float | None = None,
+    device_id: str | None = None,
+) -> Iterator[dict]:
+    for segment in list_segments(base_path):
+        blocks, sealed = _read_index(segment)
+        try:
+            f = segment.open()
+        except OSError:
+            continue
+        with f:
+            for block in blocks:
+                if since is not None and block["t1"] < since:
+                    continue
+                if until is not None and block["t0"] > until:
+                    continue
+                if device_id is not None and device_id not in block["d"]:
+                    continue
+                f.seek(block["o"])
+                data = f.read(block["e"] - block["o"])
+                yield from _matching_records(data, since=since, until=until, device_id=device_id)
+            if sealed:
+                continue
+            # Records after the last index block (active segment or unclean
+            # shutdown) are scanned line by line.
+            f.seek(blocks[-1]["e"] if blocks else 0)
+            for line in f:
+                if line.endswith(b"\n"):
+                    yield from _matching_records(
+                        line, since=since, until=until, device_id=device_id
+                    )
+
+
+def _parse_time(value: str) -> float:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Remote Brain Builder audit log tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    query = subparsers.add_parser("query", help="Stream audit records as JSON lines.")
+    query.add_argument("--audit-log", type=Path, default=Path("audit.log"))
+    query.add_argument("--since", type=_parse_time, help="ISO 8601 time (UTC if no offset).")
+    query.add_argument("--until", type=_parse_time, help="ISO 8601 time (UTC if no offset).")
+    query.add_argument("--device", dest="device_id")
+    args = parser.parse_args()
+
+    for record in query_audit(
+        args.audit_log, since=args.since, until=args.until, device_id=args.device_id
+    ):
+        sys.stdout.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,31 @@ import os
 from dataclasses import dataclass
 from pathlib import Path
 
+from .audit import DEFAULT_AUDIT_MAX_SEGMENTS, DEFAULT_AUDIT_SEGMENT_BYTES
+from .input_ring import DEFAULT_RING_SLOTS
+from .security import (
+    DEFAULT_DEVICE_STATE_IDLE_TTL_S,
+    DEFAULT_DEVICE_STATE_MAX,
+    DEFAULT_INJECT_LATENCY_TARGET_MS,
+    DEFAULT_INJECT_QUEUE_TARGET,
+    DEFAULT_RATE_LIMIT_MAX_PER_SEC,
+    DEFAULT_RATE_LIMIT_MIN_PER_SEC,
+)
+from .watchdog import DEFAULT_LOOP_LAG_INTERVAL_MS, DEFAULT_LOOP_LAG_THRESHOLD_MS
+
 DEFAULT_PORT = 8765
 DEFAULT_WEB_UI_PORT = 8766
 DEFAULT_RATE_LIMIT_PER_SEC = 30
+DEFAULT_WS_MAX_MESSAGE_BYTES = 64 * 1024
+DEFAULT_WS_FRAME_MAX_CHARS = 8 * 1024
+DEFAULT_WS_FRAME_BUDGET_PER_SEC = 250
+DEFAULT_WS_UNBOUND_FRAME_BUDGET_PER_SEC = 20
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_WS_MAX_CONNECTIONS_PER_IP = 8
+DEFAULT_WEB_UI_MAX_CONNECTIONS_PER_IP = 16
+DEFAULT_WS_IDLE_TIMEOUT_S = 300.0
+DEFAULT_WS_UNPAIRED_TIMEOUT_S = 120.0
+DEFAULT_WEB_UI_REQUEST_TIMEOUT_S = 10.0
 
 
 @dataclass(slots=True)
@@ -16,11 +38,41 @@ class AgentConfig:
     port: int = DEFAULT_PORT
     trusted_registry_path: Path = Path("trusted_devices.json")
     audit_log_path: Path = Path("audit.log")
+    audit_segment_bytes: int = DEFAULT_AUDIT_SEGMENT_BYTES
+    audit_max_segments: int = DEFAULT_AUDIT_MAX_SEGMENTS
+    audit_compress_segments: bool = True
     rate_limit_per_sec: int = DEFAULT_RATE_LIMIT_PER_SEC
+    rate_limit_adaptive: bool = False
+    rate_limit_min_per_sec: int = DEFAULT_RATE_LIMIT_MIN_PER_SEC
+    rate_limit_max_per_sec: int = DEFAULT_RATE_LIMIT_MAX_PER_SEC
+    inject_latency_target_ms: float = DEFAULT_INJECT_LATENCY_TARGET_MS
+    inject_queue_target: int = DEFAULT_INJECT_QUEUE_TARGET
+    device_state_max: int = DEFAULT_DEVICE_STATE_MAX
+    device_state_idle_ttl_s: float = DEFAULT_DEVICE_STATE_IDLE_TTL_S
     show_pairing_window: bool = True
     web_ui_enabled: bool = True
     web_ui_host: str = "0.0.0.0"
     web_ui_port: int = DEFAULT_WEB_UI_PORT
+    ws_max_message_bytes: int = DEFAULT_WS_MAX_MESSAGE_BYTES
+    ws_frame_max_chars: int = DEFAULT_WS_FRAME_MAX_CHARS
+    ws_frame_budget_per_sec: float = DEFAULT_WS_FRAME_BUDGET_PER_SEC
+    ws_unbound_frame_budget_per_sec: float = DEFAULT_WS_UNBOUND_FRAME_BUDGET_PER_SEC
+    ws_compress_input: bool = False
+    ws_compress_bulk: bool = True
+    ws_max_connections: int = DEFAULT_MAX_CONNECTIONS
+    ws_max_connections_per_ip: int = DEFAULT_WS_MAX_CONNECTIONS_PER_IP
+    ws_idle_timeout_s: float = DEFAULT_WS_IDLE_TIMEOUT_S
+    ws_unpaired_timeout_s: float = DEFAULT_WS_UNPAIRED_TIMEOUT_S
+    web_ui_max_connections: int = DEFAULT_MAX_CONNECTIONS
+    web_ui_max_connections_per_ip: int = DEFAULT_WEB_UI_MAX_CONNECTIONS_PER_IP
+    web_ui_request_timeout_s: float = DEFAULT_WEB_UI_REQUEST_TIMEOUT_S
+    trace_capture_path: Path | None = None
+    ipc_socket_path: Path | None = None
+    ipc_socket_mode: int = 0o600
+    loop_lag_interval_ms: int = DEFAULT_LOOP_LAG_INTERVAL_MS
+    loop_lag_threshold_ms: int = DEFAULT_LOOP_LAG_THRESHOLD_MS
+    injector_process: bool = False
+    injector_ring_slots: int = DEFAULT_RING_SLOTS
 
 
 def parse_args() -> AgentConfig:
@@ -41,10 +93,77 @@ def parse_args() -> AgentConfig:
         type=Path,
         default=Path(os.getenv("WINDOWS_AGENT_AUDIT_LOG", "audit.log")),
     )
+    parser.add_argument(
+        "--audit-segment-bytes",
+        type=int,
+        default=int(
+            os.getenv("WINDOWS_AGENT_AUDIT_SEGMENT_BYTES", str(DEFAULT_AUDIT_SEGMENT_BYTES))
+        ),
+    )
+    parser.add_argument(
+        "--audit-max-segments",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_AUDIT_MAX_SEGMENTS", str(DEFAULT_AUDIT_MAX_SEGMENTS))),
+        help="Delete the oldest audit segments beyond this count (0 keeps all).",
+    )
+    parser.add_argument(
+        "--no-audit-compress",
+        action="store_true",
+        help="Keep sealed audit segments uncompressed.",
+    )
     parser.add_argument(
         "--rate-limit-per-sec",
         type=int,
         default=int(os.getenv("WINDOWS_AGENT_RATE_LIMIT", str(DEFAULT_RATE_LIMIT_PER_SEC))),
+        help="Per-device events per second (the starting allowance in adaptive mode).",
+    )
+    parser.add_argument(
+        "--rate-limit-adaptive",
+        action="store_true",
+        default=os.getenv("WINDOWS_AGENT_RATE_LIMIT_ADAPTIVE", "") == "1",
+        help="Adjust each device's allowance from measured injection latency and backlog.",
+    )
+    parser.add_argument(
+        "--rate-limit-min-per-sec",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_RATE_LIMIT_MIN", str(DEFAULT_RATE_LIMIT_MIN_PER_SEC))),
+    )
+    parser.add_argument(
+        "--rate-limit-max-per-sec",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_RATE_LIMIT_MAX", str(DEFAULT_RATE_LIMIT_MAX_PER_SEC))),
+    )
+    parser.add_argument(
+        "--inject-latency-target-ms",
+        type=float,
+        default=float(
+            os.getenv(
+                "WINDOWS_AGENT_INJECT_LATENCY_TARGET_MS", str(DEFAULT_INJECT_LATENCY_TARGET_MS)
+            )
+        ),
+        help="Adaptive mode backs off when smoothed injection latency exceeds this.",
+    )
+    parser.add_argument(
+        "--inject-queue-target",
+        type=int,
+        default=int(
+            os.getenv("WINDOWS_AGENT_INJECT_QUEUE_TARGET", str(DEFAULT_INJECT_QUEUE_TARGET))
+        ),
+        help="Adaptive mode backs off when more injections than this are queued.",
+    )
+    parser.add_argument(
+        "--device-state-max",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_DEVICE_STATE_MAX", str(DEFAULT_DEVICE_STATE_MAX))),
+        help="Maximum per-device nonce/rate/pairing entries kept (least recently used evicted).",
+    )
+    parser.add_argument(
+        "--device-state-idle-ttl",
+        type=float,
+        default=float(
+            os.getenv("WINDOWS_AGENT_DEVICE_STATE_IDLE_TTL", str(DEFAULT_DEVICE_STATE_IDLE_TTL_S))
+        ),
+        help="Evict per-device state unused for this many seconds (0 disables).",
     )
     parser.add_argument(
         "--no-pairing-window",
@@ -65,6 +184,139 @@ def parse_args() -> AgentConfig:
         type=int,
         default=int(os.getenv("WINDOWS_AGENT_WEB_UI_PORT", str(DEFAULT_WEB_UI_PORT))),
     )
+    parser.add_argument(
+        "--ws-max-message-bytes",
+        type=int,
+        default=int(
+            os.getenv("WINDOWS_AGENT_WS_MAX_MESSAGE_BYTES", str(DEFAULT_WS_MAX_MESSAGE_BYTES))
+        ),
+    )
+    parser.add_argument(
+        "--ws-frame-max-chars",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_WS_FRAME_MAX_CHARS", str(DEFAULT_WS_FRAME_MAX_CHARS))),
+        help="Drop text frames longer than this before JSON decoding (0 disables).",
+    )
+    parser.add_argument(
+        "--ws-frame-budget-per-sec",
+        type=float,
+        default=float(
+            os.getenv("WINDOWS_AGENT_WS_FRAME_BUDGET", str(DEFAULT_WS_FRAME_BUDGET_PER_SEC))
+        ),
+        help="Frames per second a connection bound to a trusted device may send (0 disables).",
+    )
+    parser.add_argument(
+        "--ws-unbound-frame-budget-per-sec",
+        type=float,
+        default=float(
+            os.getenv(
+                "WINDOWS_AGENT_WS_UNBOUND_FRAME_BUDGET",
+                str(DEFAULT_WS_UNBOUND_FRAME_BUDGET_PER_SEC),
+            )
+        ),
+        help="Frames per second allowed before a connection is bound to a device (0 disables).",
+    )
+    parser.add_argument(
+        "--ws-compress-input",
+        action="store_true",
+        help="Negotiate permessage-deflate on input channel connections.",
+    )
+    parser.add_argument(
+        "--no-ws-compress-bulk",
+        action="store_true",
+        help="Disable permessage-deflate on bulk/status channel connections.",
+    )
+    parser.add_argument(
+        "--ws-max-connections",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_WS_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))),
+        help="Maximum concurrent websocket connections (0 disables the cap).",
+    )
+    parser.add_argument(
+        "--ws-max-connections-per-ip",
+        type=int,
+        default=int(
+            os.getenv(
+                "WINDOWS_AGENT_WS_MAX_CONNECTIONS_PER_IP", str(DEFAULT_WS_MAX_CONNECTIONS_PER_IP)
+            )
+        ),
+    )
+    parser.add_argument(
+        "--ws-idle-timeout",
+        type=float,
+        default=float(os.getenv("WINDOWS_AGENT_WS_IDLE_TIMEOUT", str(DEFAULT_WS_IDLE_TIMEOUT_S))),
+        help="Close websocket connections idle for this many seconds (0 disables).",
+    )
+    parser.add_argument(
+        "--ws-unpaired-timeout",
+        type=float,
+        default=float(
+            os.getenv("WINDOWS_AGENT_WS_UNPAIRED_TIMEOUT", str(DEFAULT_WS_UNPAIRED_TIMEOUT_S))
+        ),
+        help="Close connections that have not paired or used a trusted device (0 disables).",
+    )
+    parser.add_argument(
+        "--web-ui-max-connections",
+        type=int,
+        default=int(
+            os.getenv("WINDOWS_AGENT_WEB_UI_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))
+        ),
+    )
+    parser.add_argument(
+        "--web-ui-max-connections-per-ip",
+        type=int,
+        default=int(
+            os.getenv(
+                "WINDOWS_AGENT_WEB_UI_MAX_CONNECTIONS_PER_IP",
+                str(DEFAULT_WEB_UI_MAX_CONNECTIONS_PER_IP),
+            )
+        ),
+    )
+    parser.add_argument(
+        "--web-ui-request-timeout",
+        type=float,
+        default=float(
+            os.getenv("WINDOWS_AGENT_WEB_UI_REQUEST_TIMEOUT", str(DEFAULT_WEB_UI_REQUEST_TIMEOUT_S))
+        ),
+    )
+    parser.add_argument(
+        "--ipc-socket",
+        type=Path,
+        default=os.getenv("WINDOWS_AGENT_IPC_SOCKET") or None,
+        help="Also serve the websocket protocol on this Unix domain socket for local clients.",
+    )
+    parser.add_argument(
+        "--ipc-socket-mode",
+        type=lambda value: int(value, 8),
+        default=os.getenv("WINDOWS_AGENT_IPC_SOCKET_MODE", "600"),
+        help="Octal permission bits for the IPC socket (default 600, owner only).",
+    )
+    parser.add_argument(
+        "--trace-capture",
+        type=Path,
+        default=os.getenv("WINDOWS_AGENT_TRACE_CAPTURE") or None,
+        help="Record accepted input/system envelopes with arrival times for replay.",
+    )
+    parser.add_argument(
+        "--loop-lag-threshold-ms",
+        type=int,
+        default=int(
+            os.getenv("WINDOWS_AGENT_LOOP_LAG_THRESHOLD_MS", str(DEFAULT_LOOP_LAG_THRESHOLD_MS))
+        ),
+        help="Log the blocked stack when the event loop stalls this long (0 disables).",
+    )
+    parser.add_argument(
+        "--injector-process",
+        action="store_true",
+        default=os.getenv("WINDOWS_AGENT_INJECTOR_PROCESS", "") == "1",
+        help="Inject input from a separate supervised process fed by a shared-memory ring.",
+    )
+    parser.add_argument(
+        "--injector-ring-slots",
+        type=int,
+        default=int(os.getenv("WINDOWS_AGENT_INJECTOR_RING_SLOTS", str(DEFAULT_RING_SLOTS))),
+        help="Input events the shared-memory ring can hold before new ones are refused.",
+    )
 
     args = parser.parse_args()
     return AgentConfig(
@@ -72,9 +324,38 @@ def parse_args() -> AgentConfig:
         port=args.port,
         trusted_registry_path=args.trusted_registry,
         audit_log_path=args.audit_log,
+        audit_segment_bytes=max(4096, args.audit_segment_bytes),
+        audit_max_segments=max(0, args.audit_max_segments),
+        audit_compress_segments=not args.no_audit_compress,
         rate_limit_per_sec=max(1, args.rate_limit_per_sec),
+        rate_limit_adaptive=args.rate_limit_adaptive,
+        rate_limit_min_per_sec=max(1, args.rate_limit_min_per_sec),
+        rate_limit_max_per_sec=max(1, args.rate_limit_max_per_sec),
+        inject_latency_target_ms=max(0.1, args.inject_latency_target_ms),
+        inject_queue_target=max(0, args.inject_queue_target),
+        device_state_max=max(1, args.device_state_max),
+        device_state_idle_ttl_s=max(0.0, args.device_state_idle_ttl),
         show_pairing_window=not args.no_pairing_window,
         web_ui_enabled=not args.no_web_ui,
         web_ui_host=args.web_ui_host,
         web_ui_port=args.web_ui_port,
+        ws_max_message_bytes=max(1024, args.ws_max_message_bytes),
+        ws_frame_max_chars=max(0, args.ws_frame_max_chars),
+        ws_frame_budget_per_sec=max(0.0, args.ws_frame_budget_per_sec),
+        ws_unbound_frame_budget_per_sec=max(0.0, args.ws_unbound_frame_budget_per_sec),
+        ws_compress_input=args.ws_compress_input,
+        ws_compress_bulk=not args.no_ws_compress_bulk,
+        ws_max_connections=max(0, args.ws_max_connections),
+        ws_max_connections_per_ip=max(0, args.ws_max_connections_per_ip),
+        ws_idle_timeout_s=max(0.0, args.ws_idle_timeout),
+        ws_unpaired_timeout_s=max(0.0, args.ws_unpaired_timeout),
+        web_ui_max_connections=max(0, args.web_ui_max_connections),
+        web_ui_max_connections_per_ip=max(0, args.web_ui_max_connections_per_ip),
+        web_ui_request_timeout_s=max(0.1, args.web_ui_request_timeout),
+        trace_capture_path=args.trace_capture,
+        ipc_socket_path=args.ipc_socket,
+        ipc_socket_mode=args.ipc_socket_mode & 0o777,
+        loop_lag_threshold_ms=max(0, args.loop_lag_threshold_ms),
+        injector_process=args.injector_process,
+        injector_ring_slots=max(16, args.injector_ring_slots),
     )
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .input_control import InputController
+from .input_ring import DEFAULT_RING_SLOTS, InputRing, RingInputController, drain
+
+SUPERVISE_INTERVAL_S = 0.1
+RESTART_BACKOFF_S = 0.5
+MAX_RESTART_BACKOFF_S = 10.0
+STABLE_AFTER_S = 30.0
+STOP_TIMEOUT_S = 2.0
+
+
+def _injector_main(
+    name: str,
+    slots: int,
+    items: Any,
+    free: Any,
+    stop: Any,
+    controller_factory: Callable[[], Any],
+) -> None:
+    ring = InputRing.attach(name, slots, items, free)
+    try:
+        drain(ring, controller_factory(), stop)
+    finally:
+        ring.close()
+
+
+class InjectorSupervisor:
+    def __init__(
+        self,
+        *,
+        slots: int = DEFAULT_RING_SLOTS,
+        controller_factory: Callable[[], Any] = InputController,
+    ) -> None:
+        self.slots = slots
+        self.controller_factory = controller_factory
+        self.controller = RingInputController()
+        self.ring: InputRing | None = None
+        self.restarts = 0
+        self._reported_errors = 0
+        self.logger = logging.getLogger("windows_agent.injector")
+        # Spawn everywhere: it is the only start method on Windows, and forking a
+        # process that already runs an event loop and threads is unsafe.
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._process: Any = None
+
+    def queue_depth(self) -> int:
+        return self.ring.depth() if self.ring is not None else 0
+
+    def last_injection_s(self) -> float:
+        return self.ring.stats()[0] / 1e9 if self.ring is not None else 0.0
+
+    def _start(self) -> None:
+        assert self.ring is not None
+        self._process = self._ctx.Process(
+            target=_injector_main,
+            args=(
+                self.ring.shm.name,
+                self.slots,
+                self.ring.items,
+                self.ring.free,
+                self._stop,
+                self.controller_factory,
+            ),
+            name="windows-agent-injector",
+            daemon=True,
+        )
+        self._process.start()
+
+    async def run(self) -> None:
+        self.ring = InputRing.create(self._ctx, self.slots)
+        self._stop.clear()
+        backoff = RESTART_BACKOFF_S
+        try:
+            while True:
+                self._start()
+                self.controller.ring = self.ring
+                started = time.monotonic()
+                while self._process.is_alive():
+                    self._report_failures()
+                    await asyncio.sleep(SUPERVISE_INTERVAL_S)
+                self._report_failures()
+                if time.monotonic() - started >= STABLE_AFTER_S:
+                    backoff = RESTART_BACKOFF_S
+                self.restarts += 1
+                # Whatever the dead process was injecting was already acked as
+                # queued; this line is its only record in the audit log.
+                self.logger.warning(
+                    "injector_exited exitcode=%s queue_depth=%d restart_in_s=%.1f",
+                    self._process.exitcode,
+                    self.ring.depth(),
+                    backoff,
+                )
+                # Queued events stay in the ring and are injected by the
+                # replacement; new ones are accepted until the ring fills.
+                await asyncio.sleep(backoff)
+                backoff = min(MAX_RESTART_BACKOFF_S, backoff * 2)
+                self.ring.reset_semaphores(self._ctx)
+        finally:
+            self.controller.ring = None
+            self._stop.set()
+            try:
+                await self._stop_process()
+            finally:
+                # Reached even if shutdown is cancelled again mid-wait.
+                if self._process is not None and self._process.is_alive():
+                    self._process.terminate()
+                self.ring.close(unlink=True)
+                self.ring = None
+
+    async def _stop_process(self) -> None:
+        # Joins run in a worker thread: blocking here would stall every other
+        # service on the loop for up to STOP_TIMEOUT_S.
+        if self._process is None:
+            return
+        await asyncio.to_thread(self._process.join, STOP_TIMEOUT_S)
+        if self._process.is_alive():
+            self._process.terminate()
+            await asyncio.to_thread(self._process.join, STOP_TIMEOUT_S)
+        if self._process.is_alive():
+            self._process.kill()
+            await asyncio.to_thread(self._process.join)
+
+    def _report_failures(self) -> None:
+        # The injector's own log goes to its stderr, not the audit log. Report
+        # failed injections here so the audit log does not read as all-success
+        # after actions were acked as queued.
+        errors = self.ring.stats()[2]
+        if errors > self._reported_errors:
+            self.logger.warning(
+                "injection_failed count=%d total=%d", errors - self._reported_errors, errors
+            )
+            self._reported_errors = errors
+
+    def snapshot(self) -> dict:
+        alive = self._process is not None and self._process.is_alive()
+        stats = self.ring.stats() if self.ring is not None else (0, 0, 0)
+        return {
+            "pid": self._process.pid if alive else None,
+            "alive": alive,
+            "restarts": self.restarts,
+            "queue_depth": self.queue_depth(),
+            "slots": self.slots,
+            "injected": stats[1],
+            "errors": stats[2],
+            "last_injection_ms": round(stats[0] / 1e6, 3),
+        }
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import sys
+import unicodedata
 from dataclasses import dataclass
 
 VALID_BUTTONS = {"left", "right", "middle"}
@@ -12,33 +14,97 @@ MEDIA_KEY_MAP = {
     "vol_down": "volumedown",
     "mute": "volumemute",
 }
+MAX_TEXT_LENGTH = 256
+TEXT_CONTROL_CHARS = {"\n", "\t"}
+
+
+def normalize_text(text: str) -> str:
+    normalized = unicodedata.normalize("NFC", text)
+    if not normalized or len(normalized) > MAX_TEXT_LENGTH:
+        raise ValueError("Invalid text length")
+    for char in normalized:
+        if unicodedata.category(char) in {"Cc", "Cs"} and char not in TEXT_CONTROL_CHARS:
+            raise ValueError("Unsupported control character in text")
+    return normalized
+
+
+def _send_unicode_windows(text: str) -> None:
+    import ctypes
+    from ctypes import wintypes
+
+    input_keyboard = 1
+    keyeventf_keyup = 0x0002
+    keyeventf_unicode = 0x0004
+
+    class KEYBDINPUT(ctypes.Structure):
+        _fields_ = [
+            ("wVk", wintypes.WORD),
+            ("wScan", wintypes.WORD),
+            ("dwFlags", wintypes.DWORD),
+            ("time", wintypes.DWORD),
+            ("dwExtraInfo", ctypes.c_size_t),
+        ]
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [
+            ("dx", wintypes.LONG),
+            ("dy", wintypes.LONG),
+            ("mouseData", wintypes.DWORD),
+            ("dwFlags", wintypes.DWORD),
+            ("time", wintypes.DWORD),
+            ("dwExtraInfo", ctypes.c_size_t),
+        ]
+
+    class _INPUTUNION(ctypes.Union):
+        _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+    class INPUT(ctypes.Structure):
+        _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+    # KEYEVENTF_UNICODE takes UTF-16 code units, so astral characters become
+    # surrogate pairs.
+    encoded = text.encode("utf-16-le")
+    code_units = [int.from_bytes(encoded[i : i + 2], "little") for i in range(0, len(encoded), 2)]
+    events = []
+    for unit in code_units:
+        for flags in (keyeventf_unicode, keyeventf_unicode | keyeventf_keyup):
+            event = INPUT(type=input_keyboard)
+            event.union.ki = KEYBDINPUT(wVk=0, wScan=unit, dwFlags=flags, time=0, dwExtraInfo=0)
+            events.append(event)
+    array = (INPUT * len(events))(*events)
+    sent = ctypes.windll.user32.SendInput(len(events), array, ctypes.sizeof(INPUT))
+    if sent != len(events):
+        raise OSError("SendInput failed to inject text")
 
 
 @dataclass(slots=True)
 class InputController:
+    # Every call passes _pause=False: pyautogui otherwise sleeps PAUSE (0.1 s)
+    # after each action, which blocks the caller and makes every injection look
+    # far slower than the adaptive rate limiter's latency target.
     def _pyautogui(self):
         import pyautogui  # lazy import for test/headless safety
 
         return pyautogui
 
     def mouse_move(self, *, dx: float, dy: float) -> None:
-        self._pyautogui().moveRel(dx, dy, duration=0)
+        self._pyautogui().moveRel(dx, dy, duration=0, _pause=False)
 
     def mouse_click(self, *, button: str, action: str) -> None:
         if button not in VALID_BUTTONS or action not in VALID_ACTIONS:
             raise ValueError("Invalid mouse click parameters")
         pyautogui = self._pyautogui()
         if action == "down":
-            pyautogui.mouseDown(button=button)
+            pyautogui.mouseDown(button=button, _pause=False)
         else:
-            pyautogui.mouseUp(button=button)
+            pyautogui.mouseUp(button=button, _pause=False)
 
     def mouse_scroll(self, *, delta_x: float, delta_y: float) -> None:
         pyautogui = self._pyautogui()
         if delta_y:
-            pyautogui.scroll(int(delta_y))
+            pyautogui.scroll(int(delta_y), _pause=False)
         if delta_x:
-            pyautogui.hscroll(int(delta_x))
+            pyautogui.hscroll(int(delta_x), _pause=False)
 
     def keypress(self, *, key: str, action: str) -> None:
         if action not in VALID_ACTIONS:
@@ -46,11 +112,40 @@ class InputController:
         pyautogui = self._pyautogui()
         normalized_key = key.lower()
         if action == "down":
-            pyautogui.keyDown(normalized_key)
+            pyautogui.keyDown(normalized_key, _pause=False)
+        else:
+            pyautogui.keyUp(normalized_key, _pause=False)
+
+    def _send_unicode(self, text: str) -> None:
+        if sys.platform != "win32":
+            raise ValueError("Unicode text injection is only supported on Windows")
+        _send_unicode_windows(text)
+
+    def text(self, *, text: str) -> None:
+        normalized = normalize_text(text)
+        pyautogui = self._pyautogui()
+        # pyautogui.write silently drops characters it has no key for, so split
+        # the string into runs and send the rest as Unicode key events.
+        typeable = set(pyautogui.KEYBOARD_KEYS)
+        run = ""
+        run_typeable = True
+        for char in normalized:
+            char_typeable = char in typeable
+            if run and char_typeable != run_typeable:
+                self._write_run(pyautogui, run, typeable=run_typeable)
+                run = ""
+            run += char
+            run_typeable = char_typeable
+        if run:
+            self._write_run(pyautogui, run, typeable=run_typeable)
+
+    def _write_run(self, pyautogui, run: str, *, typeable: bool) -> None:
+        if typeable:
+            pyautogui.write(run, interval=0, _pause=False)
         else:
-            pyautogui.keyUp(normalized_key)
+            self._send_unicode(run)
 
     def system_media(self, *, command: str) -> None:
         if command not in MEDIA_KEY_MAP:
             raise ValueError("Unsupported media command")
-        self._pyautogui().press(MEDIA_KEY_MAP[command])
+        self._pyautogui().press(MEDIA_KEY_MAP[command], _pause=False)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Any
+
+from .input_control import MAX_TEXT_LENGTH, MEDIA_KEY_MAP, VALID_ACTIONS, VALID_BUTTONS
+
+DEFAULT_RING_SLOTS = 1024
+KIND_MOUSE_MOVE = 1
+KIND_MOUSE_CLICK = 2
+KIND_MOUSE_SCROLL = 3
+KIND_KEYPRESS = 4
+KIND_TEXT = 5
+KIND_SYSTEM_MEDIA = 6
+ACTION_CODES = {"down": 1, "up": 2}
+ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+
+# Header: producer and consumer counters on separate cache lines, then
+# injector-side stats. Records follow at HEADER_SIZE.
+HEADER_SIZE = 256
+WRITE_OFFSET = 0
+READ_OFFSET = 64
+STATS_OFFSET = 128
+COUNTER = struct.Struct("<Q")
+STATS = struct.Struct("<QQQ")  # last injection ns, injected, errors
+RECORD_HEAD = struct.Struct("<BBHdd")  # kind, action, text bytes, a, b
+TEXT_CAPACITY = MAX_TEXT_LENGTH * 4
+RECORD_SIZE = RECORD_HEAD.size + TEXT_CAPACITY
+
+
+class InjectorBusy(Exception):
+    pass
+
+
+class InputRing:
+    # Single-producer/single-consumer ring of fixed-size input records in shared
+    # memory. The two semaphores count filled and free slots; acquiring and
+    # releasing them also orders the record writes against the reads, so no
+    # other synchronization is needed between the processes.
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, items: Any, free: Any) -> None:
+        self.shm = shm
+        self.slots = slots
+        self.items = items
+        self.free = free
+        self.buf = shm.buf
+
+    @classmethod
+    def create(cls, ctx: Any, slots: int = DEFAULT_RING_SLOTS) -> InputRing:
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + slots * RECORD_SIZE)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        return cls(shm, slots, ctx.Semaphore(0), ctx.Semaphore(slots))
+
+    @classmethod
+    def attach(cls, name: str, slots: int, items: Any, free: Any) -> InputRing:
+        # Spawned children share the parent's resource tracker, so attaching
+        # here does not make the injector's exit unlink the segment.
+        return cls(shared_memory.SharedMemory(name=name), slots, items, free)
+
+    def _counter(self, offset: int) -> int:
+        return COUNTER.unpack_from(self.buf, offset)[0]
+
+    def depth(self) -> int:
+        return self._counter(WRITE_OFFSET) - self._counter(READ_OFFSET)
+
+    def stats(self) -> tuple[int, int, int]:
+        return STATS.unpack_from(self.buf, STATS_OFFSET)
+
+    def reset_semaphores(self, ctx: Any) -> None:
+        # A crashed injector may die holding an item; rebuild both counts from
+        # the counters before a replacement attaches. Only called while no
+        # injector is running and from the producer's thread.
+        depth = self.depth()
+        self.items = ctx.Semaphore(depth)
+        self.free = ctx.Semaphore(self.slots - depth)
+
+    def put(
+        self, kind: int, *, action: int = 0, a: float = 0.0, b: float = 0.0, text: str = ""
+    ) -> None:
+        encoded = text.encode("utf-8")
+        if len(encoded) > TEXT_CAPACITY:
+            raise ValueError("Input record text too long")
+        if not self.free.acquire(False):
+            raise InjectorBusy
+        write = self._counter(WRITE_OFFSET)
+        offset = HEADER_SIZE + (write % self.slots) * RECORD_SIZE
+        RECORD_HEAD.pack_into(self.buf, offset, kind, action, len(encoded), a, b)
+        start = offset + RECORD_HEAD.size
+        self.buf[start : start + len(encoded)] = encoded
+        COUNTER.pack_into(self.buf, WRITE_OFFSET, write + 1)
+        self.items.release()
+
+    def get(self, timeout: float) -> tuple[int, int, float, float, str] | None:
+        if not self.items.acquire(timeout=timeout):
+            return None
+        read = self._counter(READ_OFFSET)
+        offset = HEADER_SIZE + (read % self.slots) * RECORD_SIZE
+        kind, action, length, a, b = RECORD_HEAD.unpack_from(self.buf, offset)
+        start = offset + RECORD_HEAD.size
+        text = bytes(self.buf[start : start + length]).decode("utf-8")
+        COUNTER.pack_into(self.buf, READ_OFFSET, read + 1)
+        self.free.release()
+        return kind, action, a, b, text
+
+    def record_injection(self, duration_ns: int, *, failed: bool) -> None:
+        _, injected, errors = self.stats()
+        STATS.pack_into(
+            self.buf, STATS_OFFSET, duration_ns, injected + (not failed), errors + failed
+        )
+
+    def close(self, *, unlink: bool = False) -> None:
+        self.buf = None  # type: ignore[assignment]
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class RingInputController:
+    # Producer side of the two-process mode: validates exactly like
+    # InputController, then queues a record for the injector process.
+    def __init__(self) -> None:
+        self.ring: InputRing | None = None
+
+    def _put(self, kind: int, **fields: Any) -> None:
+        if self.ring is None:
+            raise InjectorBusy
+        self.ring.put(kind, **fields)
+
+    def mouse_move(self, *, dx: float, dy: float) -> None:
+        self._put(KIND_MOUSE_MOVE, a=dx, b=dy)
+
+    def mouse_click(self, *, button: str, action: str) -> None:
+        if button not in VALID_BUTTONS or action not in VALID_ACTIONS:
+            raise ValueError("Invalid mouse click parameters")
+        self._put(KIND_MOUSE_CLICK, action=ACTION_CODES[action], text=button)
+
+    def mouse_scroll(self, *, delta_x: float, delta_y: float) -> None:
+        self._put(KIND_MOUSE_SCROLL, a=delta_x, b=delta_y)
+
+    def keypress(self, *, key: str, action: str) -> None:
+        if action not in VALID_ACTIONS:
+            raise ValueError("Invalid key action")
+        self._put(KIND_KEYPRESS, action=ACTION_CODES[action], text=key)
+
+    def text(self, *, text: str) -> None:
+        self._put(KIND_TEXT, text=text)
+
+    def system_media(self, *, command: str) -> None:
+        if command not in MEDIA_KEY_MAP:
+            raise ValueError("Unsupported media command")
+        self._put(KIND_SYSTEM_MEDIA, text=command)
+
+
+def inject_record(controller: Any, record: tuple[int, int, float, float, str]) -> None:
+    kind, action, a, b, text = record
+    if kind == KIND_MOUSE_MOVE:
+        controller.mouse_move(dx=a, dy=b)
+    elif kind == KIND_MOUSE_CLICK:
+        controller.mouse_click(button=text, action=ACTION_NAMES[action])
+    elif kind == KIND_MOUSE_SCROLL:
+        controller.mouse_scroll(delta_x=a, delta_y=b)
+    elif kind == KIND_KEYPRESS:
+        controller.keypress(key=text, action=ACTION_NAMES[action])
+    elif kind == KIND_TEXT:
+        controller.text(text=text)
+    elif kind == KIND_SYSTEM_MEDIA:
+        controller.system_media(command=text)
+    else:
+        raise ValueError(f"Unknown input record kind {kind}")
+
+
+def drain(ring: InputRing, controller: Any, stop: Any, *, poll_s: float = 0.2) -> None:
+    logger = logging.getLogger("windows_agent.injector")
+    parent = multiprocessing.parent_process()
+    while not stop.is_set():
+        record = ring.get(timeout=poll_s)
+        if record is None:
+            # Spawned children are not killed with their parent on Windows.
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        started = time.perf_counter_ns()
+        failed = False
+        try:
+            inject_record(controller, record)
+        except Exception:
+            failed = True
+            logger.exception("injection_failed kind=%d", record[0])
+        ring.record_injection(time.perf_counter_ns() - started, failed=failed)
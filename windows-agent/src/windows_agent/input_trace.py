@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+TRACE_VERSION = 1
+
+
+@dataclass(slots=True)
+class TraceEvent:
+    offset: float
+    message: dict
+
+
+class TraceWriter:
+    def __init__(self, path: Path, *, protocol_version: str) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("w", encoding="utf-8", buffering=1)
+        self._start: float | None = None
+        header = {"trace_version": TRACE_VERSION, "protocol_version": protocol_version}
+        self._file.write(json.dumps(header, separators=(",", ":")) + "\n")
+
+    def record(self, msg: dict, *, arrived: float | None = None) -> None:
+        if arrived is None:
+            arrived = time.monotonic()
+        if self._start is None:
+            self._start = arrived
+        offset = round(arrived - self._start, 6)
+        self._file.write(json.dumps([offset, msg], separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def load_trace(path: Path) -> list[TraceEvent]:
+    events: list[TraceEvent] = []
+    with path.open(encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("trace_version") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {header.get('trace_version')}")
+        for line in f:
+            if not line.strip():
+                continue
+            offset, message = json.loads(line)
+            events.append(TraceEvent(offset=float(offset), message=message))
+    return events
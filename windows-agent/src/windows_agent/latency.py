@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+
+PROBE_WINDOW = 32
+PROBE_PENDING = 4
+
+
+def percentile(values: Iterable[float], q: float) -> float | None:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class LatencyProbe:
+    def __init__(self, window: int = PROBE_WINDOW) -> None:
+        self.last_ping_at = float("-inf")
+        self._pending: deque[tuple[float, float, float]] = deque(maxlen=PROBE_PENDING)
+        self._samples: deque[tuple[float, float]] = deque(maxlen=window)
+
+    def record_pong(self, *, client_ts: float, server_rx_ts: float, server_tx_ts: float) -> None:
+        self._pending.append((client_ts, server_rx_ts, server_tx_ts))
+
+    def observe(self, *, client_ts: float, client_rx_ts: float) -> bool:
+        # Only complete exchanges this connection actually answered, so a client
+        # cannot inject arbitrary server timestamps into the estimate.
+        for t1, t2, t3 in self._pending:
+            if t1 == client_ts:
+                break
+        else:
+            return False
+        self._pending.remove((t1, t2, t3))
+        t4 = client_rx_ts
+        rtt = (t4 - t1) - (t3 - t2)
+        if rtt < 0:
+            return False
+        offset = ((t2 - t1) + (t3 - t4)) / 2
+        self._samples.append((rtt, offset))
+        return True
+
+    def snapshot(self) -> dict:
+        if not self._samples:
+            return {
+                "samples": 0,
+                "rtt_ms_last": None,
+                "rtt_ms_p50": None,
+                "rtt_ms_min": None,
+                "offset_ms": None,
+            }
+        rtts = [rtt for rtt, _ in self._samples]
+        # The lowest-RTT exchange has the least queueing asymmetry, so its offset is
+        # the best clock estimate in the window.
+        _, offset = min(self._samples)
+        return {
+            "samples": len(self._samples),
+            "rtt_ms_last": round(rtts[-1], 3),
+            "rtt_ms_p50": round(percentile(rtts, 0.5), 3),
+            "rtt_ms_min": round(min(rtts), 3),
+            "offset_ms": round(offset, 3),
+        }
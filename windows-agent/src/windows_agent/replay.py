@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import AgentConfig
+from .input_trace import TraceEvent, load_trace
+
+REPLAY_RATE_LIMIT_PER_SEC = 1_000_000
+
+
+class RecordingInputController:
+    def __init__(self) -> None:
+        self.events: list[list] = []
+
+    def mouse_move(self, *, dx: float, dy: float) -> None:
+        self.events.append(["mouse_move", {"dx": dx, "dy": dy}])
+
+    def mouse_click(self, *, button: str, action: str) -> None:
+        self.events.append(["mouse_click", {"button": button, "action": action}])
+
+    def mouse_scroll(self, *, delta_x: float, delta_y: float) -> None:
+        self.events.append(["mouse_scroll", {"delta_x": delta_x, "delta_y": delta_y}])
+
+    def keypress(self, *, key: str, action: str) -> None:
+        self.events.append(["keypress", {"key": key, "action": action}])
+
+    def text(self, *, text: str) -> None:
+        self.events.append(["text", {"text": text}])
+
+    def system_media(self, *, command: str) -> None:
+        self.events.append(["system_media", {"command": command}])
+
+
+class ReplayWebSocket:
+    def __init__(self, events: list[TraceEvent], *, speed: float | None) -> None:
+        self.events = events
+        self.speed = speed
+        self.latencies: list[float] = []
+        self._delivered_at: float | None = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._frames()
+
+    async def _frames(self) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        for event in self.events:
+            if self.speed:
+                delay = event.offset / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._delivered_at = time.perf_counter()
+            yield json.dumps(event.message)
+
+    async def send(self, message: str) -> None:
+        if self._delivered_at is not None:
+            self.latencies.append(time.perf_counter() - self._delivered_at)
+            self._delivered_at = None
+
+
+@dataclass(slots=True)
+class ReplayReport:
+    frames: int
+    elapsed_s: float
+    latencies: list[float] = field(default_factory=list)
+    injected: list[list] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+        return {
+            "frames": self.frames,
+            "injected": len(self.injected),
+            "elapsed_s": round(self.elapsed_s, 6),
+            "throughput_per_sec": round(self.frames / self.elapsed_s, 1) if self.elapsed_s else 0.0,
+            "latency_p50_us": round(statistics.median(ordered) * 1e6, 1) if ordered else 0.0,
+            "latency_p99_us": round(p99 * 1e6, 1),
+        }
+
+
+async def replay_trace(
+    events: list[TraceEvent],
+    *,
+    speed: float | None = None,
+    rate_limit_per_sec: int = REPLAY_RATE_LIMIT_PER_SEC,
+) -> ReplayReport:
+    from .server import WindowsAgentServer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = AgentConfig(
+            host="127.0.0.1",
+            trusted_registry_path=Path(tmp) / "trusted.json",
+            audit_log_path=Path(tmp) / "audit.log",
+            rate_limit_per_sec=rate_limit_per_sec,
+            ws_idle_timeout_s=0,
+            ws_unpaired_timeout_s=0,
+            ws_frame_budget_per_sec=0,
+            ws_unbound_frame_budget_per_sec=0,
+            show_pairing_window=False,
+            web_ui_enabled=False,
+        )
+        logger = logging.getLogger("windows_agent")
+        existing = list(logger.handlers)
+        server = WindowsAgentServer(config=config, pairing_code="000000")
+        try:
+            for device_id in sorted({event.message.get("device_id", "") for event in events}):
+                server.registry.trust_device(
+                    device_id=device_id, device_name="replay", public_key="replay"
+                )
+            recorder = RecordingInputController()
+            server.input_controller = recorder
+            websocket = ReplayWebSocket(events, speed=speed)
+
+            start = time.perf_counter()
+            await server.handle_connection(websocket)
+            elapsed = time.perf_counter() - start
+        finally:
+            # In a fresh process the server attaches the audit handler inside the
+            # temporary directory; it must be closed before the directory is
+            # removed (Windows refuses to delete open files).
+            for handler in logger.handlers[:]:
+                if handler not in existing:
+                    logger.removeHandler(handler)
+                    handler.close()
+
+    return ReplayReport(
+        frames=len(events),
+        elapsed_s=elapsed,
+        latencies=websocket.latencies,
+        injected=recorder.events,
+    )
+
+
+def diff_injected(baseline: list[list], current: list[list]) -> dict | None:
+    for index, (expected, actual) in enumerate(zip(baseline, current, strict=False)):
+        if expected != actual:
+            return {"index": index, "baseline": expected, "current": actual}
+    if len(baseline) != len(current):
+        index = min(len(baseline), len(current))
+        return {
+            "index": index,
+            "baseline": baseline[index] if index < len(baseline) else None,
+            "current": current[index] if index < len(current) else None,
+        }
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a captured input trace")
+    parser.add_argument("trace", type=Path)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed multiplier; 0 replays as fast as possible.",
+    )
+    parser.add_argument("--rate-limit-per-sec", type=int, default=REPLAY_RATE_LIMIT_PER_SEC)
+    parser.add_argument("--output", type=Path, help="Write the injected event sequence here.")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous --output.")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        replay_trace(
+            load_trace(args.trace),
+            speed=args.speed or None,
+            rate_limit_per_sec=max(1, args.rate_limit_per_sec),
+        )
+    )
+    summary = report.summary()
+    if args.output:
+        args.output.write_text(json.dumps(report.injected), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        summary["diff"] = diff_injected(baseline, report.injected)
+    print(json.dumps(summary, indent=2))
+    if summary.get("diff"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,293 @@
 from __future__ import annotations
 
+import logging
+import math
 import time
-from collections import deque
+from collections import OrderedDict, deque
+from collections.abc import Callable
+
+DEFAULT_DEVICE_STATE_MAX = 4096
+DEFAULT_DEVICE_STATE_IDLE_TTL_S = 3600.0
+DEFAULT_RATE_LIMIT_MIN_PER_SEC = 10
+DEFAULT_RATE_LIMIT_MAX_PER_SEC = 240
+DEFAULT_INJECT_LATENCY_TARGET_MS = 10.0
+DEFAULT_INJECT_QUEUE_TARGET = 16
+RATE_WINDOW_S = 1.0
+RATE_ADJUST_INTERVAL_S = 1.0
+RATE_INCREASE_STEP = 10
+RATE_DECREASE_FACTOR = 0.5
+INJECT_LATENCY_EWMA_ALPHA = 0.2
+# Measured on CPython 3.12 for 16-character device IDs and nonces: an entry with
+# its empty containers, and one remembered nonce (string, deque slot and set
+# slot). Rate events are left out; the one-second window keeps them few.
+DEVICE_STATE_BYTES = 2048
+NONCE_BYTES = 130
+
+
+class DeviceState:
+    __slots__ = (
+        "device_id",
+        "last_seen",
+        "nonces",
+        "nonce_set",
+        "rate_events",
+        "rate_used",
+        "pending_pair",
+        "rate_limit",
+        "rate_limited_hits",
+        "rate_adjusted_at",
+        "inject_latency_ewma",
+    )
+
+    def __init__(self, device_id: str, *, max_nonces: int, now: float) -> None:
+        self.device_id = device_id
+        self.last_seen = now
+        self.nonces: deque[str] = deque(maxlen=max_nonces)
+        self.nonce_set: set[str] = set()
+        self.rate_events: deque[tuple[float, int]] = deque()
+        self.rate_used = 0
+        self.pending_pair: dict | None = None
+        self.rate_limit: int | None = None
+        self.rate_limited_hits = 0
+        self.rate_adjusted_at = now
+        self.inject_latency_ewma: float | None = None
+
+
+class DeviceStateTable:
+    def __init__(
+        self,
+        *,
+        max_devices: int = DEFAULT_DEVICE_STATE_MAX,
+        idle_ttl_s: float = DEFAULT_DEVICE_STATE_IDLE_TTL_S,
+        max_nonces: int = 200,
+        is_pinned: Callable[[str], bool] | None = None,
+    ) -> None:
+        self.max_devices = max_devices
+        self.idle_ttl_s = idle_ttl_s
+        self.max_nonces = max_nonces
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        # Kept up to date by NonceTracker and _evict so snapshot() stays O(1);
+        # /metrics is unauthenticated and must not walk every nonce.
+        self.nonce_count = 0
+        self._states: OrderedDict[str, DeviceState] = OrderedDict()
+        # Trusted devices live outside the LRU: anyone can invent device IDs, and
+        # evicting a trusted device's nonce window would reopen it to replays.
+        # Their number is bounded by the trusted registry, not by traffic.
+        self.is_pinned = is_pinned
+        self._pinned: dict[str, DeviceState] = {}
+
+    def __len__(self) -> int:
+        return len(self._states) + len(self._pinned)
+
+    def get(self, device_id: str) -> DeviceState:
+        now = time.monotonic()
+        state = self._pinned.get(device_id)
+        if state is not None:
+            state.last_seen = now
+            return state
+        if self.is_pinned is not None and self.is_pinned(device_id):
+            state = self._states.pop(device_id, None)
+            if state is None:
+                state = DeviceState(device_id, max_nonces=self.max_nonces, now=now)
+            state.last_seen = now
+            self._pinned[device_id] = state
+            return state
+        state = self._states.get(device_id)
+        if state is None:
+            state = DeviceState(device_id, max_nonces=self.max_nonces, now=now)
+            self._states[device_id] = state
+        else:
+            self._states.move_to_end(device_id)
+            state.last_seen = now
+        self._evict(now)
+        return state
+
+    def peek(self, device_id: str) -> DeviceState | None:
+        state = self._pinned.get(device_id)
+        return state if state is not None else self._states.get(device_id)
+
+    def _evict(self, now: float) -> None:
+        # The dict is kept in last-seen order, so both policies only ever look at
+        # the front: each entry is evicted at most once (amortized O(1) per get).
+        while len(self._states) > self.max_devices:
+            _, state = self._states.popitem(last=False)
+            self.nonce_count -= len(state.nonces)
+            self.evicted_lru += 1
+        if self.idle_ttl_s <= 0:
+            return
+        while self._states:
+            oldest = next(iter(self._states.values()))
+            if now - oldest.last_seen <= self.idle_ttl_s:
+                break
+            self._states.popitem(last=False)
+            self.nonce_count -= len(oldest.nonces)
+            self.evicted_idle += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "devices": len(self),
+            "pinned": len(self._pinned),
+            "max_devices": self.max_devices,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+            "nonces": self.nonce_count,
+            "approx_bytes": len(self) * DEVICE_STATE_BYTES + self.nonce_count * NONCE_BYTES,
+        }
 
 
 class NonceTracker:
-    def __init__(self, max_nonces: int = 200) -> None:
+    def __init__(self, max_nonces: int = 200, states: DeviceStateTable | None = None) -> None:
         self.max_nonces = max_nonces
-        self._recent: dict[str, deque[str]] = {}
+        self.states = states if states is not None else DeviceStateTable(max_nonces=max_nonces)
 
     def is_fresh(self, *, device_id: str, nonce: str) -> bool:
         if not nonce:
             return False
-        device_nonces = self._recent.setdefault(device_id, deque(maxlen=self.max_nonces))
-        if nonce in device_nonces:
+        state = self.states.get(device_id)
+        if nonce in state.nonce_set:
             return False
-        device_nonces.append(nonce)
+        if len(state.nonces) == state.nonces.maxlen:
+            state.nonce_set.discard(state.nonces[0])
+        else:
+            self.states.nonce_count += 1
+        state.nonces.append(nonce)
+        state.nonce_set.add(nonce)
         return True
 
 
 class RateLimiter:
-    def __init__(self, limit_per_sec: int) -> None:
+    mode = "fixed"
+
+    def __init__(self, limit_per_sec: int, states: DeviceStateTable | None = None) -> None:
         self.limit_per_sec = limit_per_sec
-        self._events: dict[str, deque[float]] = {}
+        self.states = states if states is not None else DeviceStateTable()
+        self.rejected = 0
+
+    def limit_for(self, state: DeviceState) -> int:
+        return self.limit_per_sec
 
-    def allow(self, device_id: str) -> bool:
+    def allow(self, device_id: str, weight: int = 1) -> bool:
+        state = self.states.get(device_id)
+        limit = self.limit_for(state)
+        weight = max(1, min(weight, limit))
         now = time.monotonic()
-        q = self._events.setdefault(device_id, deque())
-        while q and (now - q[0]) > 1.0:
-            q.popleft()
-        if len(q) >= self.limit_per_sec:
+        q = state.rate_events
+        while q and (now - q[0][0]) > RATE_WINDOW_S:
+            state.rate_used -= q.popleft()[1]
+        if state.rate_used + weight > limit:
+            state.rate_limited_hits += 1
+            self.rejected += 1
             return False
-        q.append(now)
+        q.append((now, weight))
+        state.rate_used += weight
         return True
+
+    def backoff_hint(self, device_id: str, weight: int = 1) -> dict:
+        state = self.states.peek(device_id)
+        if state is None:
+            return {"retry_after_ms": 0, "limit_per_sec": self.limit_per_sec}
+        limit = self.limit_for(state)
+        weight = max(1, min(weight, limit))
+        # Walk the window oldest-first until enough weight has expired to fit
+        # this event; only runs on rejection, so the O(window) cost is bounded.
+        used = state.rate_used
+        retry_at = time.monotonic()
+        for ts, event_weight in state.rate_events:
+            if used + weight <= limit:
+                break
+            used -= event_weight
+            retry_at = ts + RATE_WINDOW_S
+        retry_after_ms = max(0, math.ceil((retry_at - time.monotonic()) * 1000))
+        return {"retry_after_ms": retry_after_ms, "limit_per_sec": limit}
+
+    def observe(self, device_id: str, *, latency_s: float, queue_depth: int = 0) -> None:
+        return None
+
+    def snapshot(self) -> dict:
+        return {"mode": self.mode, "limit_per_sec": self.limit_per_sec, "rejected": self.rejected}
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    # AIMD per device: a device that keeps hitting its allowance while injection
+    # is healthy gains RATE_INCREASE_STEP/s; congestion (smoothed injection
+    # latency or queue depth over target) halves it. At most one change per
+    # RATE_ADJUST_INTERVAL_S, always within [min_per_sec, max_per_sec].
+    mode = "adaptive"
+
+    def __init__(
+        self,
+        limit_per_sec: int,
+        states: DeviceStateTable | None = None,
+        *,
+        min_per_sec: int = DEFAULT_RATE_LIMIT_MIN_PER_SEC,
+        max_per_sec: int = DEFAULT_RATE_LIMIT_MAX_PER_SEC,
+        latency_target_ms: float = DEFAULT_INJECT_LATENCY_TARGET_MS,
+        queue_target: int = DEFAULT_INJECT_QUEUE_TARGET,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.min_per_sec = max(1, min_per_sec)
+        self.max_per_sec = max(self.min_per_sec, max_per_sec)
+        super().__init__(max(self.min_per_sec, min(limit_per_sec, self.max_per_sec)), states=states)
+        self.latency_target_ms = latency_target_ms
+        self.queue_target = queue_target
+        self.logger = logger or logging.getLogger("windows_agent")
+        self.increases = 0
+        self.decreases = 0
+
+    def limit_for(self, state: DeviceState) -> int:
+        return state.rate_limit if state.rate_limit is not None else self.limit_per_sec
+
+    def observe(self, device_id: str, *, latency_s: float, queue_depth: int = 0) -> None:
+        state = self.states.peek(device_id)
+        if state is None:
+            return
+        if state.inject_latency_ewma is None:
+            state.inject_latency_ewma = latency_s
+        else:
+            state.inject_latency_ewma += INJECT_LATENCY_EWMA_ALPHA * (
+                latency_s - state.inject_latency_ewma
+            )
+
+        now = time.monotonic()
+        if now - state.rate_adjusted_at < RATE_ADJUST_INTERVAL_S:
+            return
+        latency_ms = state.inject_latency_ewma * 1000
+        current = self.limit_for(state)
+        if latency_ms > self.latency_target_ms or queue_depth > self.queue_target:
+            new = max(self.min_per_sec, int(current * RATE_DECREASE_FACTOR))
+            reason = "congested"
+        elif state.rate_limited_hits:
+            new = min(self.max_per_sec, current + RATE_INCREASE_STEP)
+            reason = "saturated"
+        else:
+            return
+        state.rate_limited_hits = 0
+        state.rate_adjusted_at = now
+        if new == current:
+            return
+        state.rate_limit = new
+        if new > current:
+            self.increases += 1
+        else:
+            self.decreases += 1
+        self.logger.info(
+            "rate_limit_change device_id=%s old=%d new=%d reason=%s "
+            "inject_latency_ms=%.3f queue_depth=%d",
+            device_id,
+            current,
+            new,
+            reason,
+            latency_ms,
+            queue_depth,
+            extra={"device_id": device_id},
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            **super().snapshot(),
+            "min_per_sec": self.min_per_sec,
+            "max_per_sec": self.max_per_sec,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
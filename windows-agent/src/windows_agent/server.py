@@ -3,17 +3,39 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
 import re
 import secrets
+import shutil
+import stat
+import sys
+import tempfile
+import time
 import uuid
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from .admission import (
+    REJECTED_DECODE,
+    REJECTED_ENVELOPE,
+    ConnectionLimiter,
+    FrameBudget,
+    FrameGate,
+    peer_host,
+)
+from .audit import SegmentedAuditLog
 from .config import AgentConfig
-from .input_control import InputController
+from .injector import InjectorSupervisor
+from .input_control import InputController, normalize_text
+from .input_ring import InjectorBusy
+from .input_trace import TraceWriter
+from .latency import LatencyProbe, percentile
 from .registry import TrustedRegistry
-from .security import NonceTracker, RateLimiter
+from .security import AdaptiveRateLimiter, DeviceStateTable, NonceTracker, RateLimiter
+from .watchdog import LoopWatchdog
 
 PROTOCOL_VERSION = "1.0"
 PAIRING_CODE_TTL_MS = 60_000
@@ -22,9 +44,36 @@ INPUT_OR_SYSTEM_TYPES = {
     "input.mouse_click",
     "input.mouse_scroll",
     "input.keypress",
+    "input.text",
     "system.media",
 }
+TEXT_CHARS_PER_RATE_UNIT = 32
+PING_MIN_INTERVAL_S = 0.1
+ACTION_LATENCY_WINDOW = 256
+INJECTOR_BUSY_RETRY_MS = 50
 PAIRING_CODE_PATTERN = re.compile(r"^\d{6}$")
+CHANNEL_INPUT = "input"
+CHANNEL_BULK = "bulk"
+CHANNEL_PATHS = {
+    "/": CHANNEL_INPUT,
+    "/input": CHANNEL_INPUT,
+    "/bulk": CHANNEL_BULK,
+    "/status": CHANNEL_BULK,
+}
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+
+
+@dataclass(slots=True, eq=False)
+class ConnectionState:
+    peer: str = "local"
+    probe: LatencyProbe = field(default_factory=LatencyProbe)
+    connected_at: float = field(default_factory=time.monotonic)
+    last_activity: float = field(default_factory=time.monotonic)
+    device_id: str | None = None
+    budget: FrameBudget | None = None
 
 
 class WindowsAgentServer:
@@ -32,24 +81,71 @@ class WindowsAgentServer:
         self.config = config
         self.pairing_code = pairing_code
         self.registry = TrustedRegistry(config.trusted_registry_path)
-        self.nonce_tracker = NonceTracker()
-        self.rate_limiter = RateLimiter(config.rate_limit_per_sec)
-        self.input_controller = InputController()
-        self.pending_pair_requests: dict[str, dict] = {}
+        self.device_states = DeviceStateTable(
+            max_devices=config.device_state_max,
+            idle_ttl_s=config.device_state_idle_ttl_s,
+            is_pinned=self.registry.is_trusted,
+        )
+        self.nonce_tracker = NonceTracker(states=self.device_states)
         self.logger = logging.getLogger("windows_agent")
+        self.rate_limiter: RateLimiter
+        if config.rate_limit_adaptive:
+            self.rate_limiter = AdaptiveRateLimiter(
+                config.rate_limit_per_sec,
+                states=self.device_states,
+                min_per_sec=config.rate_limit_min_per_sec,
+                max_per_sec=config.rate_limit_max_per_sec,
+                latency_target_ms=config.inject_latency_target_ms,
+                queue_target=config.inject_queue_target,
+                logger=self.logger,
+            )
+        else:
+            self.rate_limiter = RateLimiter(config.rate_limit_per_sec, states=self.device_states)
+        self.input_controller: Any = InputController()
+        self.injector: InjectorSupervisor | None = None
+        if config.injector_process:
+            self.injector = InjectorSupervisor(slots=config.injector_ring_slots)
+            self.input_controller = self.injector.controller
+        self.trace_writer: TraceWriter | None = None
+        if config.trace_capture_path is not None:
+            self.trace_writer = TraceWriter(
+                config.trace_capture_path, protocol_version=PROTOCOL_VERSION
+            )
+        self.loop_watchdog: LoopWatchdog | None = None
+        if config.loop_lag_threshold_ms > 0:
+            self.loop_watchdog = LoopWatchdog(
+                interval_ms=config.loop_lag_interval_ms,
+                threshold_ms=config.loop_lag_threshold_ms,
+            )
+        self.admission = ConnectionLimiter(
+            max_total=config.ws_max_connections,
+            max_per_peer=config.ws_max_connections_per_ip,
+        )
+        self.frame_gate = FrameGate(
+            max_frame_chars=config.ws_frame_max_chars,
+            bound_frames_per_sec=config.ws_frame_budget_per_sec,
+            unbound_frames_per_sec=config.ws_unbound_frame_budget_per_sec,
+        )
+        self._connections: set[ConnectionState] = set()
+        self._action_latencies: deque[float] = deque(maxlen=ACTION_LATENCY_WINDOW)
         self._setup_logger(config.audit_log_path)
 
     def _setup_logger(self, path: Path) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
         self.logger.setLevel(logging.INFO)
-        handler = logging.FileHandler(path, encoding="utf-8")
-        handler.setFormatter(logging.Formatter("%(message)s"))
         if not self.logger.handlers:
+            handler = SegmentedAuditLog(
+                path,
+                segment_bytes=self.config.audit_segment_bytes,
+                max_segments=self.config.audit_max_segments,
+                compress=self.config.audit_compress_segments,
+            )
             self.logger.addHandler(handler)
 
     def _audit(self, *, device_id: str, action: str) -> None:
         ts = datetime.now(timezone.utc).isoformat()
-        self.logger.info("%s device_id=%s action=%s", ts, device_id, action)
+        self.logger.info(
+            "%s device_id=%s action=%s", ts, device_id, action, extra={"device_id": device_id}
+        )
 
     async def _send(self, websocket: Any, *, msg_type: str, device_id: str, payload: dict) -> None:
         body = {
@@ -72,10 +168,26 @@ class WindowsAgentServer:
             return "unsupported_protocol_version"
         if not self.nonce_tracker.is_fresh(device_id=msg["device_id"], nonce=msg["nonce"]):
             return "invalid_or_replayed_nonce"
-        if not self.rate_limiter.allow(msg["device_id"]):
+        if not self.rate_limiter.allow(msg["device_id"], weight=self._rate_weight(msg)):
             return "rate_limit_exceeded"
         return None
 
+    def _rate_weight(self, msg: dict) -> int:
+        if msg["type"] == "input.text" and isinstance(msg["payload"], dict):
+            text = msg["payload"].get("text")
+            if isinstance(text, str):
+                return 1 + len(text) // TEXT_CHARS_PER_RATE_UNIT
+        return 1
+
+    def _is_valid_text(self, text: Any) -> bool:
+        if not isinstance(text, str):
+            return False
+        try:
+            normalize_text(text)
+        except ValueError:
+            return False
+        return True
+
     def _is_trusted_for_action(self, msg: dict) -> bool:
         return self.registry.is_trusted(msg["device_id"])
 
@@ -92,7 +204,7 @@ class WindowsAgentServer:
                 payload={"success": False, "session_token": None, "reason": "invalid_pair_request"},
             )
             return
-        self.pending_pair_requests[msg["device_id"]] = payload
+        self.device_states.get(msg["device_id"]).pending_pair = payload
         await self._send(
             websocket,
             msg_type="pair.challenge",
@@ -120,7 +232,10 @@ class WindowsAgentServer:
             )
             return
 
-        request_payload = self.pending_pair_requests.pop(device_id, None)
+        state = self.device_states.peek(device_id)
+        request_payload = state.pending_pair if state is not None else None
+        if state is not None:
+            state.pending_pair = None
         if request_payload is None:
             self._audit(device_id=device_id, action="pair_failed_missing_request")
             await self._send(
@@ -165,7 +280,41 @@ class WindowsAgentServer:
             )
             return
 
-        payload = msg["payload"]
+        started = time.perf_counter()
+        try:
+            reason = self._dispatch_input(msg_type, msg["payload"])
+        except InjectorBusy:
+            reason = "injector_busy"
+        if reason:
+            reply = {"success": False, "session_token": None, "reason": reason}
+            if reason == "injector_busy":
+                reply["retry_after_ms"] = INJECTOR_BUSY_RETRY_MS
+            await self._send(
+                websocket,
+                msg_type="pair.result",
+                device_id="windows-host",
+                payload=reply,
+            )
+            return
+
+        self.rate_limiter.observe(
+            device_id,
+            latency_s=self._injection_latency(started),
+            queue_depth=self._injection_queue_depth(),
+        )
+        # With a separate injector the ack only means the event was accepted for
+        # injection; the audit entry says so, and failures are logged by the
+        # supervisor when the injector reports them.
+        action = msg_type if self.injector is None else f"queued:{msg_type}"
+        self._audit(device_id=device_id, action=action)
+        await self._send(
+            websocket,
+            msg_type="pair.result",
+            device_id="windows-host",
+            payload={"success": True, "session_token": None, "reason": None},
+        )
+
+    def _dispatch_input(self, msg_type: str, payload: dict) -> str | None:
         if msg_type == "input.mouse_move":
             self.input_controller.mouse_move(dx=float(payload["dx"]), dy=float(payload["dy"]))
         elif msg_type == "input.mouse_click":
@@ -180,45 +329,162 @@ class WindowsAgentServer:
             )
         elif msg_type == "input.keypress":
             self.input_controller.keypress(key=str(payload["key"]), action=str(payload["action"]))
+        elif msg_type == "input.text":
+            text = payload.get("text")
+            if not self._is_valid_text(text):
+                return "invalid_text"
+            self.input_controller.text(text=text)
         elif msg_type == "system.media":
             self.input_controller.system_media(command=str(payload["command"]))
         else:
-            await self._send(
-                websocket,
-                msg_type="pair.result",
-                device_id="windows-host",
-                payload={
-                    "success": False,
-                    "session_token": None,
-                    "reason": "message_type_not_allowed",
-                },
-            )
+            return "message_type_not_allowed"
+        return None
+
+    def _injection_latency(self, started: float) -> float:
+        # With a separate injector the local call only queues the event; use the
+        # injector's own measurement of its most recent injection instead.
+        if self.injector is not None:
+            return self.injector.last_injection_s()
+        return time.perf_counter() - started
+
+    def _injection_queue_depth(self) -> int:
+        if self.injector is not None:
+            return self.injector.queue_depth()
+        # In-process injection runs to completion on the loop before the next
+        # frame is read, so nothing ever waits behind it.
+        return 0
+
+    async def _handle_ping(
+        self, websocket: Any, msg: dict, probe: LatencyProbe, *, received_ms: float
+    ) -> None:
+        # Latency probes bypass nonce, rate limiting, audit and the pair.result ack
+        # so they measure the transport rather than the action pipeline.
+        payload = msg.get("payload")
+        if msg.get("protocol_version") != PROTOCOL_VERSION or not isinstance(payload, dict):
             return
+        client_ts = payload.get("client_ts")
+        if not isinstance(client_ts, int | float):
+            return
+        now = time.monotonic()
+        if now - probe.last_ping_at < PING_MIN_INTERVAL_S:
+            return
+        probe.last_ping_at = now
+
+        prev_client_ts = payload.get("prev_client_ts")
+        prev_client_rx_ts = payload.get("prev_client_rx_ts")
+        if isinstance(prev_client_ts, int | float) and isinstance(prev_client_rx_ts, int | float):
+            probe.observe(client_ts=prev_client_ts, client_rx_ts=prev_client_rx_ts)
 
-        self._audit(device_id=device_id, action=msg_type)
+        server_tx_ts = time.time() * 1000
+        probe.record_pong(client_ts=client_ts, server_rx_ts=received_ms, server_tx_ts=server_tx_ts)
         await self._send(
             websocket,
-            msg_type="pair.result",
+            msg_type="system.pong",
             device_id="windows-host",
-            payload={"success": True, "session_token": None, "reason": None},
+            payload={
+                "client_ts": client_ts,
+                "server_rx_ts": received_ms,
+                "server_tx_ts": server_tx_ts,
+            },
         )
 
+    def metrics(self) -> dict:
+        latencies = [latency * 1000 for latency in self._action_latencies]
+        p50 = percentile(latencies, 0.5)
+        p99 = percentile(latencies, 0.99)
+        return {
+            "connections": len(self._connections),
+            "admission": self.admission.snapshot(),
+            "frame_rejections": self.frame_gate.snapshot(),
+            "device_states": self.device_states.snapshot(),
+            "rate_limit": self.rate_limiter.snapshot(),
+            "network_rtt": [conn.probe.snapshot() for conn in self._connections],
+            "action_latency_ms": {
+                "samples": len(latencies),
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p99": round(p99, 3) if p99 is not None else None,
+            },
+            "loop_lag": self.loop_watchdog.snapshot() if self.loop_watchdog else None,
+            "injector": self.injector.snapshot() if self.injector else None,
+        }
+
     async def handle_connection(self, websocket: Any) -> None:
-        async for raw in websocket:
+        peer = peer_host(getattr(websocket, "remote_address", None))
+        rejected = self.admission.try_acquire(peer)
+        if rejected:
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason=rejected)
+            return
+        conn = ConnectionState(peer=peer)
+        conn.budget = self.frame_gate.budget(bound=False, now=conn.connected_at)
+        self._connections.add(conn)
+        try:
+            await self._handle_frames(websocket, conn)
+        finally:
+            self._connections.discard(conn)
+            self.admission.release(peer)
+
+    def _next_deadline(self, conn: ConnectionState) -> tuple[float | None, str]:
+        deadlines = []
+        if self.config.ws_idle_timeout_s > 0:
+            deadlines.append((conn.last_activity + self.config.ws_idle_timeout_s, "idle_closed"))
+        if self.config.ws_unpaired_timeout_s > 0 and conn.device_id is None:
+            deadlines.append(
+                (conn.connected_at + self.config.ws_unpaired_timeout_s, "unpaired_closed")
+            )
+        if not deadlines:
+            return None, ""
+        when, reason = min(deadlines)
+        return max(0.0, when - time.monotonic()), reason
+
+    async def _handle_frames(self, websocket: Any, conn: ConnectionState) -> None:
+        frames = aiter(websocket)
+        while True:
+            timeout, reason = self._next_deadline(conn)
+            try:
+                async with asyncio.timeout(timeout):
+                    raw = await anext(frames)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                self.admission.count(reason)
+                code = CLOSE_POLICY_VIOLATION if reason == "unpaired_closed" else CLOSE_GOING_AWAY
+                await websocket.close(code=code, reason=reason)
+                return
+
+            arrived = time.monotonic()
+            received_ms = time.time() * 1000
+            if self.frame_gate.check(raw, conn.budget, arrived):
+                continue
             try:
                 msg = json.loads(raw)
             except json.JSONDecodeError:
+                msg = None
+            if not isinstance(msg, dict):
+                self.frame_gate.count(REJECTED_DECODE)
+                continue
+
+            if msg.get("type") == "system.ping":
+                await self._handle_ping(websocket, msg, conn.probe, received_ms=received_ms)
                 continue
 
             err = self._validate_envelope(msg)
             if err:
+                self.frame_gate.count(REJECTED_ENVELOPE)
+                payload = {"success": False, "session_token": None, "reason": err}
+                if err == "rate_limit_exceeded":
+                    payload |= self.rate_limiter.backoff_hint(
+                        msg["device_id"], weight=self._rate_weight(msg)
+                    )
                 await self._send(
                     websocket,
                     msg_type="pair.result",
                     device_id="windows-host",
-                    payload={"success": False, "session_token": None, "reason": err},
+                    payload=payload,
                 )
                 continue
+            # Only real protocol traffic keeps a connection alive: probes and
+            # rejected frames must not stop a forgotten tab from being reaped.
+            conn.last_activity = arrived
 
             msg_type = msg["type"]
             if self._requires_trusted_device(msg_type) and not self._is_trusted_for_action(msg):
@@ -245,7 +511,10 @@ class WindowsAgentServer:
             elif msg_type == "pair.confirm":
                 await self._handle_pair_confirm(websocket, msg)
             elif msg_type in INPUT_OR_SYSTEM_TYPES:
+                if self.trace_writer is not None:
+                    self.trace_writer.record(msg, arrived=arrived)
                 await self._handle_action(websocket, msg)
+                self._action_latencies.append(time.monotonic() - arrived)
             else:
                 await self._send(
                     websocket,
@@ -258,8 +527,88 @@ class WindowsAgentServer:
                     },
                 )
 
-    async def run(self) -> None:
+            if conn.device_id is None and self.registry.is_trusted(msg["device_id"]):
+                conn.device_id = msg["device_id"]
+                conn.budget = self.frame_gate.budget(bound=True, now=time.monotonic())
+
+    def _channel_for_path(self, path: str) -> str:
+        return CHANNEL_PATHS.get(path.split("?", maxsplit=1)[0], CHANNEL_INPUT)
+
+    def _compression_enabled(self, channel: str) -> bool:
+        if channel == CHANNEL_BULK:
+            return self.config.ws_compress_bulk
+        return self.config.ws_compress_input
+
+    def _process_request(self, connection: Any, request: Any) -> None:
+        # permessage-deflate is offered server-wide; drop it before the handshake
+        # response for channels that carry small, latency-sensitive frames.
+        # available_extensions is ServerProtocol state rather than documented
+        # API, hence the websockets>=17.0 floor; test_ws_compression.py fails if
+        # a release stops honouring it.
+        channel = self._channel_for_path(request.path)
+        if not self._compression_enabled(channel):
+            connection.protocol.available_extensions = []
+        return None
+
+    def serve(self) -> Any:
         from websockets.asyncio.server import serve
 
-        async with serve(self.handle_connection, self.config.host, self.config.port):
+        compress = self.config.ws_compress_input or self.config.ws_compress_bulk
+        return serve(
+            self.handle_connection,
+            self.config.host,
+            self.config.port,
+            compression="deflate" if compress else None,
+            max_size=self.config.ws_max_message_bytes,
+            process_request=self._process_request,
+        )
+
+    def serve_ipc(self, path: Path | None = None) -> Any:
+        from websockets.asyncio.server import unix_serve
+
+        # Local clients gain nothing from permessage-deflate.
+        return unix_serve(
+            self.handle_connection,
+            path=str(path or self.config.ipc_socket_path),
+            compression=None,
+            max_size=self.config.ws_max_message_bytes,
+        )
+
+    async def run(self) -> None:
+        async with self.serve():
             await asyncio.Future()
+
+    async def run_ipc(self) -> None:
+        path = self.config.ipc_socket_path
+        if path is None:
+            return
+        # Every Windows event loop raises NotImplementedError from
+        # create_unix_server, even though the method exists.
+        if sys.platform == "win32":
+            raise RuntimeError(
+                "--ipc-socket needs Unix domain sockets, which asyncio lacks on Windows"
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            if not stat.S_ISSOCK(path.stat().st_mode):
+                raise RuntimeError(f"{path} exists and is not a socket")
+            path.unlink()
+        # Bind inside a fresh 0700 directory, apply the configured mode, then move
+        # the socket into place. Nobody else can reach it before the mode is set,
+        # and the process-wide umask (shared with the audit compressor thread)
+        # is left alone.
+        staging = Path(tempfile.mkdtemp(prefix=".", dir=path.parent))
+        bound = staging / "s"
+        try:
+            try:
+                ipc_server = await self.serve_ipc(bound)
+            except NotImplementedError as exc:
+                raise RuntimeError("--ipc-socket needs Unix domain socket support") from exc
+            async with ipc_server:
+                os.chmod(bound, self.config.ipc_socket_mode)
+                os.replace(bound, path)
+                staging.rmdir()
+                await asyncio.Future()
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            path.unlink(missing_ok=True)
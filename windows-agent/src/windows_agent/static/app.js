@@ -1,4 +1,6 @@
 const statusEl = document.getElementById("status");
+const latencyEl = document.getElementById("latency");
+const motionStatsEl = document.getElementById("motionStats");
 const pairCodeInput = document.getElementById("pairCode");
 const pairBtn = document.getElementById("pairBtn");
 const keyboardInput = document.getElementById("keyboardInput");
@@ -30,9 +32,17 @@ const deviceId = localStorage.getItem("device_id") || uuidv4();
 localStorage.setItem("device_id", deviceId);
 
 const CURSOR_SPEED_KEY = "cursor_speed";
+// The agent trusts a device ID, not a connection: once paired, a reconnect can
+// resume without the pairing code until the agent answers device_not_trusted.
+const PAIRED_KEY = "paired";
+const MAX_QUEUED_FRAMES = 32;
 const DEFAULT_CURSOR_SPEED = 2.0;
 const MIN_CURSOR_SPEED = 0.5;
 const MAX_CURSOR_SPEED = 4.0;
+const MAX_TEXT_LENGTH = 256;
+const PING_INTERVAL_MS = 2000;
+// Skip motion flushes while this much data is still queued in the socket.
+const BUFFERED_AMOUNT_HIGH_WATER = 8 * 1024;
 
 function readCursorSpeed() {
   const stored = Number.parseFloat(localStorage.getItem(CURSOR_SPEED_KEY) || "");
@@ -57,6 +67,17 @@ let paired = false;
 let lastSingleTouch = null;
 let lastTwoFingerCenter = null;
 let pendingTap = false;
+let pingTimer = null;
+let lastPong = null;
+let pendingMove = { dx: 0, dy: 0 };
+let pendingScrollY = 0;
+let flushScheduled = false;
+let flushFrameId = 0;
+let rawTouchEvents = 0;
+let motionFramesSent = 0;
+let backoffUntil = 0;
+let composing = false;
+let queuedFrames = [];
 
 function nonce() {
   const bytes = new Uint8Array(16);
@@ -90,17 +111,133 @@ function envelope(type, payload) {
   };
 }
 
-function send(type, payload) {
+function rememberPairing(remember) {
+  if (remember) {
+    localStorage.setItem(PAIRED_KEY, deviceId);
+  } else {
+    localStorage.removeItem(PAIRED_KEY);
+  }
+}
+
+function isPairingRemembered() {
+  return localStorage.getItem(PAIRED_KEY) === deviceId;
+}
+
+function transmit(type, payload) {
   if (!ws || ws.readyState !== WebSocket.OPEN) {
-    return;
+    // The agent reaps idle connections; a remembered pairing reconnects on the
+    // next interaction and delivers clicks and keys once the socket is open.
+    if (paired && isPairingRemembered()) {
+      if (type !== "input.mouse_move" && type !== "input.mouse_scroll") {
+        queuedFrames = [...queuedFrames, { type, payload }].slice(-MAX_QUEUED_FRAMES);
+      }
+      connect();
+    }
+    return false;
   }
 
   if ((type.startsWith("input.") || type.startsWith("system.")) && !paired) {
     setStatus("Pair first to use controls", "disconnected");
-    return;
+    return false;
   }
 
   ws.send(JSON.stringify(envelope(type, payload)));
+  return true;
+}
+
+function send(type, payload) {
+  // Clicks and keys must land after the motion that preceded them.
+  flushMotion();
+  transmit(type, payload);
+}
+
+function updateMotionStats() {
+  motionStatsEl.textContent = `Motion frames sent: ${motionFramesSent} / touch events: ${rawTouchEvents}`;
+}
+
+function flushMotion() {
+  if (pendingMove.dx !== 0 || pendingMove.dy !== 0) {
+    if (transmit("input.mouse_move", pendingMove)) {
+      motionFramesSent += 1;
+    }
+    pendingMove = { dx: 0, dy: 0 };
+  }
+
+  if (pendingScrollY !== 0) {
+    if (transmit("input.mouse_scroll", { delta_x: 0, delta_y: pendingScrollY })) {
+      motionFramesSent += 1;
+    }
+    pendingScrollY = 0;
+  }
+
+  updateMotionStats();
+}
+
+function cancelMotionFlush() {
+  if (flushScheduled) {
+    cancelAnimationFrame(flushFrameId);
+    flushScheduled = false;
+  }
+}
+
+function onAnimationFrame() {
+  flushScheduled = false;
+  if (!ws || ws.readyState !== WebSocket.OPEN) {
+    // A closed socket never drains bufferedAmount; stop instead of spinning
+    // on requestAnimationFrame until reconnect.
+    return;
+  }
+  if (
+    (ws && ws.bufferedAmount > BUFFERED_AMOUNT_HIGH_WATER) ||
+    performance.now() < backoffUntil
+  ) {
+    // Keep accumulating deltas until the socket drains (or the agent's rate-limit
+    // backoff expires) instead of queueing more frames.
+    scheduleMotionFlush();
+    return;
+  }
+  flushMotion();
+}
+
+function scheduleMotionFlush() {
+  if (!flushScheduled) {
+    flushScheduled = true;
+    flushFrameId = requestAnimationFrame(onAnimationFrame);
+  }
+}
+
+function queueMove(dx, dy) {
+  pendingMove.dx += dx;
+  pendingMove.dy += dy;
+  scheduleMotionFlush();
+}
+
+function queueScroll(deltaY) {
+  pendingScrollY += deltaY;
+  scheduleMotionFlush();
+}
+
+function sendPing() {
+  if (!ws || ws.readyState !== WebSocket.OPEN) {
+    return;
+  }
+
+  // Probes bypass send(): they are allowed before pairing and never acked.
+  const payload = { client_ts: Date.now() };
+  if (lastPong) {
+    payload.prev_client_ts = lastPong.client_ts;
+    payload.prev_client_rx_ts = lastPong.client_rx_ts;
+  }
+  ws.send(JSON.stringify(envelope("system.ping", payload)));
+}
+
+function handlePong(payload) {
+  const receivedAt = Date.now();
+  const agentMs = payload.server_tx_ts - payload.server_rx_ts;
+  const rttMs = receivedAt - payload.client_ts - agentMs;
+  const offsetMs = (payload.server_rx_ts - payload.client_ts + (payload.server_tx_ts - receivedAt)) / 2;
+  lastPong = { client_ts: payload.client_ts, client_rx_ts: receivedAt };
+  latencyEl.textContent = `Latency: ${rttMs.toFixed(0)} ms network RTT, ${agentMs.toFixed(1)} ms agent, clock offset ${offsetMs.toFixed(0)} ms`;
 }
 
 function sendClick(button = "left") {
@@ -113,26 +250,64 @@ function connect() {
     return;
   }
 
-  setPairedState(false);
+  setPairedState(isPairingRemembered());
   setStatus(`Connecting to ${wsUrl}...`, "connecting");
   ws = new WebSocket(wsUrl);
 
-  ws.onopen = () => setStatus(`Connected (${deviceId})`, "connected");
+  ws.onopen = () => {
+    setStatus(`Connected (${deviceId})`, "connected");
+    lastPong = null;
+    sendPing();
+    pingTimer = setInterval(sendPing, PING_INTERVAL_MS);
+    const frames = queuedFrames;
+    queuedFrames = [];
+    for (const frame of frames) {
+      transmit(frame.type, frame.payload);
+    }
+  };
   ws.onclose = () => {
-    setPairedState(false);
-    setStatus("Disconnected", "disconnected");
+    cancelMotionFlush();
+    pendingMove = { dx: 0, dy: 0 };
+    pendingScrollY = 0;
+    backoffUntil = 0;
+    clearInterval(pingTimer);
+    pingTimer = null;
+    // Controls stay enabled with a remembered pairing so that touching them
+    // reconnects; otherwise the pairing code is needed again.
+    setPairedState(isPairingRemembered());
+    setStatus(paired ? "Disconnected (reconnects on input)" : "Disconnected", "disconnected");
   };
   ws.onerror = () => setStatus("WebSocket error", "disconnected");
   ws.onmessage = (event) => {
     try {
       const msg = JSON.parse(event.data);
+      if (msg.type === "system.pong") {
+        handlePong(msg.payload);
+        return;
+      }
+
       if (msg.type === "pair.result") {
         if (msg.payload?.success) {
+          rememberPairing(true);
           setPairedState(true);
           setStatus("Pairing result: success", "connected");
           return;
         }
 
+        if (msg.payload?.reason === "device_not_trusted") {
+          rememberPairing(false);
+          queuedFrames = [];
+          setPairedState(false);
+        }
+
+        if (
+          msg.payload?.reason === "rate_limit_exceeded" ||
+          msg.payload?.reason === "injector_busy"
+        ) {
+          backoffUntil = performance.now() + (msg.payload.retry_after_ms || 0);
+          return;
+        }
+
         if (msg.payload?.reason) {
           setStatus(`Pairing result: ${msg.payload.reason}`, "disconnected");
         }
@@ -166,26 +341,62 @@ keyboardInput.addEventListener("keydown", (event) => {
     return;
   }
 
-  if (event.key.length === 1 || event.key === "Enter" || event.key === "Backspace" || event.key === "Tab") {
+  if (event.key === "Enter" || event.key === "Backspace" || event.key === "Tab") {
     send("input.keypress", { key: event.key, action: "down" });
     send("input.keypress", { key: event.key, action: "up" });
   }
 });
 
+function sendText(text) {
+  // One input.text frame per MAX_TEXT_LENGTH code points instead of a keypress pair per character.
+  const chars = Array.from(text);
+  for (let i = 0; i < chars.length; i += MAX_TEXT_LENGTH) {
+    send("input.text", { text: chars.slice(i, i + MAX_TEXT_LENGTH).join("") });
+  }
+}
+
+function resetKeyboardInput() {
+  if (!composing && keyboardInput.value.length > 32) {
+    keyboardInput.value = "";
+  }
+}
+
 keyboardInput.addEventListener("input", (event) => {
   if (!paired) {
     return;
   }
 
-  const value = event.target.value;
-  const last = value.at(-1);
-  if (last) {
-    send("input.keypress", { key: last, action: "down" });
-    send("input.keypress", { key: last, action: "up" });
+  // IME composition (Gboard and most Android keyboards) reports the whole word
+  // composed so far on every input event; only the committed string from
+  // compositionend is sent. Pastes are handled by the paste listener.
+  if (event.inputType === "insertText" && event.data) {
+    sendText(event.data);
+  }
+  resetKeyboardInput();
+});
+
+keyboardInput.addEventListener("compositionstart", () => {
+  composing = true;
+});
+
+keyboardInput.addEventListener("compositionend", (event) => {
+  composing = false;
+  if (paired && event.data) {
+    sendText(event.data);
   }
+  resetKeyboardInput();
+});
 
-  if (value.length > 32) {
-    event.target.value = "";
+keyboardInput.addEventListener("paste", (event) => {
+  if (!paired) {
+    return;
+  }
+
+  event.preventDefault();
+  // The agent rejects control characters other than \n and \t.
+  const text = event.clipboardData?.getData("text/plain").replace(/\r\n?/g, "\n");
+  if (text) {
+    sendText(text);
   }
 });
 
@@ -220,6 +431,7 @@ touchpad.addEventListener("touchmove", (event) => {
   }
 
   event.preventDefault();
+  rawTouchEvents += 1;
 
   if (event.touches.length === 1 && lastSingleTouch) {
     const touch = event.touches[0];
@@ -227,7 +439,7 @@ touchpad.addEventListener("touchmove", (event) => {
     const dy = touch.clientY - lastSingleTouch.y;
     if (Math.abs(dx) > 1 || Math.abs(dy) > 1) {
       pendingTap = false;
-      send("input.mouse_move", { dx: dx * cursorSpeed, dy: dy * cursorSpeed });
+      queueMove(dx * cursorSpeed, dy * cursorSpeed);
     }
     lastSingleTouch = { x: touch.clientX, y: touch.clientY };
     return;
@@ -239,7 +451,7 @@ touchpad.addEventListener("touchmove", (event) => {
     const centerY = (first.clientY + second.clientY) / 2;
     const deltaY = centerY - lastTwoFingerCenter.y;
     if (Math.abs(deltaY) > 1) {
-      send("input.mouse_scroll", { delta_x: 0, delta_y: -deltaY * 2 });
+      queueScroll(-deltaY * 2);
     }
     lastTwoFingerCenter = {
       x: (first.clientX + second.clientX) / 2,
@@ -273,5 +485,5 @@ cursorSpeedInput.addEventListener("input", (event) => {
   localStorage.setItem(CURSOR_SPEED_KEY, cursorSpeed.toFixed(1));
 });
 
-setPairedState(false);
+setPairedState(isPairingRemembered());
 connect();
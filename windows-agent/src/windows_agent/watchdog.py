@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from .latency import percentile
+
+DEFAULT_LOOP_LAG_INTERVAL_MS = 100
+DEFAULT_LOOP_LAG_THRESHOLD_MS = 250
+LAG_WINDOW = 1024
+
+
+def _watchdog_logger() -> logging.Logger:
+    # Stack dumps are multi-line diagnostics, not audit records: keep them out
+    # of the windows_agent audit handler and send them to stderr instead.
+    logger = logging.getLogger("windows_agent.watchdog")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
+
+
+class LoopWatchdog:
+    def __init__(
+        self,
+        *,
+        interval_ms: int = DEFAULT_LOOP_LAG_INTERVAL_MS,
+        threshold_ms: int = DEFAULT_LOOP_LAG_THRESHOLD_MS,
+    ) -> None:
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.blocks = 0
+        self.logger = _watchdog_logger()
+        self._lags: deque[float] = deque(maxlen=LAG_WINDOW)
+        self._lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._blocked_stack: str | None = None
+
+    def _monitor(self, stop: threading.Event) -> None:
+        # Runs off the loop thread: a blocked loop cannot report on itself.
+        while not stop.wait(self.interval):
+            with self._lock:
+                if self._blocked_stack is not None:
+                    continue
+                if time.monotonic() - self._heartbeat - self.interval < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._blocked_stack = "".join(traceback.format_stack(frame))
+
+    def _beat(self, now: float, lag: float) -> None:
+        with self._lock:
+            stack = self._blocked_stack
+            self._blocked_stack = None
+            self._heartbeat = now
+        if stack is not None:
+            self.blocks += 1
+            self.logger.warning("event_loop_blocked duration_ms=%.1f stack:\n%s", lag * 1000, stack)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        # One stop event per run, so a monitor still finishing its last wait
+        # cannot be revived by a later run() clearing a shared event.
+        stop = threading.Event()
+        monitor = threading.Thread(
+            target=self._monitor, args=(stop,), name="loop-watchdog", daemon=True
+        )
+        monitor.start()
+        try:
+            while True:
+                expected = loop.time() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, loop.time() - expected)
+                self._lags.append(lag)
+                self._beat(time.monotonic(), lag)
+        finally:
+            # No join: it would block the loop for up to one interval. The
+            # daemon thread exits on its own at its next wake-up.
+            stop.set()
+
+    def snapshot(self) -> dict:
+        lags = [lag * 1000 for lag in self._lags]
+        p50 = percentile(lags, 0.5)
+        p99 = percentile(lags, 0.99)
+        return {
+            "samples": len(lags),
+            "p50_ms": round(p50, 3) if p50 is not None else None,
+            "p99_ms": round(p99, 3) if p99 is not None else None,
+            "max_ms": round(max(lags), 3) if lags else None,
+            "blocks": self.blocks,
+        }
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import json
 from collections.abc import Awaitable, Callable
 from pathlib import Path
 
+from .admission import ConnectionLimiter, peer_host
+
 
 class StaticUIHTTPServer:
     def __init__(
@@ -12,10 +15,20 @@ class StaticUIHTTPServer:
         host: str,
         port: int,
         static_dir: Path,
+        metrics_provider: Callable[[], dict] | None = None,
+        max_connections: int = 0,
+        max_connections_per_ip: int = 0,
+        request_timeout_s: float = 10.0,
     ) -> None:
         self.host = host
         self.port = port
         self.static_dir = static_dir
+        self.metrics_provider = metrics_provider
+        self.request_timeout_s = request_timeout_s
+        self.admission = ConnectionLimiter(
+            max_total=max_connections,
+            max_per_peer=max_connections_per_ip,
+        )
 
     async def _send_response(
         self,
@@ -45,8 +58,48 @@ class StaticUIHTTPServer:
         reader: asyncio.StreamReader,
         writer: asyncio.StreamWriter,
     ) -> None:
+        peer = peer_host(writer.get_extra_info("peername"))
+        if self.admission.try_acquire(peer):
+            try:
+                await self._send_response(
+                    writer,
+                    status="503 Service Unavailable",
+                    content_type="text/plain; charset=utf-8",
+                    body=b"too many connections",
+                )
+            except Exception:
+                writer.close()
+            return
         try:
+            await self._serve_client(reader, writer)
+        finally:
+            self.admission.release(peer)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> bytes:
+        async with asyncio.timeout(self.request_timeout_s):
             request_line = await reader.readline()
+            if not request_line:
+                return request_line
+            # Drain headers without processing; this is a tiny static server.
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+        return request_line
+
+    async def _serve_client(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            try:
+                request_line = await self._read_request(reader)
+            except TimeoutError:
+                self.admission.count("idle_closed")
+                writer.close()
+                await writer.wait_closed()
+                return
             if not request_line:
                 writer.close()
                 await writer.wait_closed()
@@ -63,12 +116,6 @@ class StaticUIHTTPServer:
                 )
                 return
 
-            # Drain headers without processing; this is a tiny static server.
-            while True:
-                line = await reader.readline()
-                if line in (b"\r\n", b"\n", b""):
-                    break
-
             if method != "GET":
                 await self._send_response(
                     writer,
@@ -79,6 +126,17 @@ class StaticUIHTTPServer:
                 return
 
             path = target.split("?", maxsplit=1)[0]
+            if path == "/metrics" and self.metrics_provider is not None:
+                await self._send_response(
+                    writer,
+                    status="200 OK",
+                    content_type="application/json; charset=utf-8",
+                    body=json.dumps(
+                        self.metrics_provider() | {"web_ui_admission": self.admission.snapshot()}
+                    ).encode(),
+                )
+                return
+
             if path in ("/", "/index.html"):
                 file_path = self.static_dir / "index.html"
                 content_type = "text/html; charset=utf-8"
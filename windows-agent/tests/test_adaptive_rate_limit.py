@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+
+from windows_agent import security
+from windows_agent.config import AgentConfig
+from windows_agent.input_control import InputController
+from windows_agent.security import AdaptiveRateLimiter, DeviceStateTable, RateLimiter
+from windows_agent.server import WindowsAgentServer
+
+
+class DummyWebSocket:
+    def __init__(self, frames: list[str]) -> None:
+        self.frames = frames
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+class PausingPyAutoGUI:
+    # Mirrors pyautogui's default: every action sleeps PAUSE afterwards unless
+    # the caller passes _pause=False.
+    PAUSE = 0.1
+
+    def keyDown(self, key: str, _pause: bool = True) -> None:
+        if _pause:
+            time.sleep(self.PAUSE)
+
+    keyUp = keyDown
+
+
+class PausingInputController(InputController):
+    def _pyautogui(self):
+        return PausingPyAutoGUI()
+
+
+class NullInputController:
+    def keypress(self, *, key: str, action: str) -> None:
+        pass
+
+
+def _clock(monkeypatch) -> list[float]:
+    clock = [1000.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: clock[0])
+    return clock
+
+
+def _saturate(limiter: RateLimiter, device_id: str) -> int:
+    allowed = 0
+    while limiter.allow(device_id):
+        allowed += 1
+    return allowed
+
+
+def test_allowance_grows_while_injection_is_fast(monkeypatch, caplog) -> None:
+    clock = _clock(monkeypatch)
+    limiter = AdaptiveRateLimiter(20, DeviceStateTable(), min_per_sec=10, max_per_sec=35)
+
+    with caplog.at_level(logging.INFO, logger="windows_agent"):
+        for _ in range(3):
+            clock[0] += 1.5
+            _saturate(limiter, "dev")
+            limiter.observe("dev", latency_s=0.001)
+
+    clock[0] += 1.5
+    assert _saturate(limiter, "dev") == 35
+    assert limiter.snapshot()["increases"] == 2
+    changes = [r.getMessage() for r in caplog.records if "rate_limit_change" in r.getMessage()]
+    assert len(changes) == 2
+    assert "old=20 new=30 reason=saturated" in changes[0]
+
+
+def test_allowance_halves_on_slow_injection_or_backlog(monkeypatch) -> None:
+    clock = _clock(monkeypatch)
+    limiter = AdaptiveRateLimiter(
+        40, DeviceStateTable(), min_per_sec=15, latency_target_ms=5.0, queue_target=4
+    )
+    limiter.allow("dev")
+
+    clock[0] += 1.5
+    limiter.observe("dev", latency_s=0.050)
+    assert limiter.limit_for(limiter.states.get("dev")) == 20
+
+    clock[0] += 0.5
+    limiter.observe("dev", latency_s=0.0, queue_depth=10)
+    assert limiter.limit_for(limiter.states.get("dev")) == 20
+
+    clock[0] += 1.0
+    limiter.observe("dev", latency_s=0.0, queue_depth=10)
+    assert limiter.limit_for(limiter.states.get("dev")) == 15
+    assert limiter.snapshot()["decreases"] == 2
+
+
+def test_backoff_hint_reports_time_until_window_frees(monkeypatch) -> None:
+    clock = _clock(monkeypatch)
+    limiter = RateLimiter(2, DeviceStateTable())
+    limiter.allow("dev")
+    clock[0] += 0.4
+    limiter.allow("dev")
+    clock[0] += 0.2
+
+    assert not limiter.allow("dev")
+    hint = limiter.backoff_hint("dev")
+    assert 400 <= hint["retry_after_ms"] <= 401
+    assert hint["limit_per_sec"] == 2
+
+
+def test_rate_limited_reply_carries_backoff_hint(tmp_path: Path) -> None:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        rate_limit_per_sec=2,
+        rate_limit_adaptive=True,
+        rate_limit_min_per_sec=1,
+        show_pairing_window=False,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = NullInputController()
+    frames = [
+        json.dumps(
+            {
+                "protocol_version": "1.0",
+                "type": "input.keypress",
+                "id": f"id-{i}",
+                "ts": 1735689600000 + i,
+                "nonce": f"nonce-{i}",
+                "device_id": "android-1",
+                "payload": {"key": "a", "action": "up"},
+            }
+        )
+        for i in range(3)
+    ]
+    ws = DummyWebSocket(frames)
+
+    asyncio.run(server.handle_connection(ws))
+
+    last = json.loads(ws.messages[-1])["payload"]
+    assert last["reason"] == "rate_limit_exceeded"
+    assert 0 < last["retry_after_ms"] <= 1001
+    assert last["limit_per_sec"] == 2
+    assert server.metrics()["rate_limit"]["mode"] == "adaptive"
+    assert server.metrics()["rate_limit"]["rejected"] == 1
+
+
+def test_real_controller_injection_is_measured_without_pyautogui_pause(tmp_path: Path) -> None:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        rate_limit_adaptive=True,
+        inject_latency_target_ms=10.0,
+        show_pairing_window=False,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = PausingInputController()
+    frames = [
+        json.dumps(
+            {
+                "protocol_version": "1.0",
+                "type": "input.keypress",
+                "id": f"id-{i}",
+                "ts": 1735689600000 + i,
+                "nonce": f"nonce-{i}",
+                "device_id": "android-1",
+                "payload": {"key": "a", "action": "down" if i % 2 == 0 else "up"},
+            }
+        )
+        for i in range(4)
+    ]
+
+    asyncio.run(server.handle_connection(DummyWebSocket(frames)))
+
+    # With the pause every injection would measure ~100 ms, over the 10 ms
+    # target, and adaptive mode could only ever halve the allowance.
+    latency_ms = server.device_states.peek("android-1").inject_latency_ewma * 1000
+    assert latency_ms < cfg.inject_latency_target_ms
@@ -0,0 +1,283 @@
+import asyncio
+import json
+from pathlib import Path
+
+from windows_agent import server as server_module
+from windows_agent.admission import ConnectionLimiter, FrameGate
+from windows_agent.config import AgentConfig
+from windows_agent.server import WindowsAgentServer
+from windows_agent.web_ui_server import StaticUIHTTPServer
+
+
+class IdleWebSocket:
+    def __init__(self, frames: list[str] | None = None, peer: str = "10.0.0.2") -> None:
+        self.frames = frames or []
+        self.remote_address = (peer, 50000)
+        self.messages: list[str] = []
+        self.closed_with: tuple[int, str] | None = None
+        self._closed = asyncio.Event()
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+        await self._closed.wait()
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.closed_with = (code, reason)
+        self._closed.set()
+
+
+class PingingWebSocket(IdleWebSocket):
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+        i = 0
+        while not self._closed.is_set():
+            await asyncio.sleep(0.01)
+            i += 1
+            yield json.dumps(
+                {
+                    "protocol_version": "1.0",
+                    "type": "system.ping",
+                    "id": f"ping-{i}",
+                    "ts": 1735689600000 + i,
+                    "nonce": f"ping-nonce-{i}",
+                    "device_id": "android-1",
+                    "payload": {"client_ts": 1735689600000 + i},
+                }
+            )
+
+
+class NullInputController:
+    def keypress(self, *, key: str, action: str) -> None:
+        pass
+
+
+def _server(tmp_path: Path, **overrides) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+        **overrides,
+    )
+    return WindowsAgentServer(config=cfg, pairing_code="123456")
+
+
+def _move(i: int) -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.keypress",
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": "android-1",
+            "payload": {"key": "a", "action": "up"},
+        }
+    )
+
+
+def test_limiter_enforces_total_and_per_peer_caps() -> None:
+    limiter = ConnectionLimiter(max_total=3, max_per_peer=2)
+
+    assert limiter.try_acquire("a") is None
+    assert limiter.try_acquire("a") is None
+    assert limiter.try_acquire("a") == "rejected_peer_limit"
+    assert limiter.try_acquire("b") is None
+    assert limiter.try_acquire("c") == "rejected_total_limit"
+    limiter.release("a")
+    assert limiter.try_acquire("c") is None
+
+    snapshot = limiter.snapshot()
+    assert snapshot["active"] == 3
+    assert snapshot["peers"] == 3
+    assert snapshot["rejected_peer_limit"] == 1
+    assert snapshot["rejected_total_limit"] == 1
+
+
+def test_frame_gate_checks_type_size_then_budget() -> None:
+    gate = FrameGate(max_frame_chars=16, bound_frames_per_sec=2, unbound_frames_per_sec=0)
+    budget = gate.budget(bound=True, now=100.0)
+
+    assert gate.budget(bound=False, now=100.0) is None
+    assert gate.check(b"{}", budget, 100.0) == "frame_type"
+    assert gate.check("x" * 17, budget, 100.0) == "frame_size"
+    assert gate.check("{}", budget, 100.0) is None
+    assert gate.check("{}", budget, 100.0) is None
+    assert gate.check("{}", budget, 100.0) == "budget"
+    assert gate.check("{}", budget, 100.5) is None
+
+    assert gate.snapshot() == {
+        "frame_type": 1,
+        "frame_size": 1,
+        "budget": 1,
+        "decode": 0,
+        "envelope": 0,
+    }
+
+
+def test_rejected_frames_are_not_decoded(tmp_path: Path, monkeypatch) -> None:
+    server = _server(
+        tmp_path,
+        ws_frame_max_chars=512,
+        ws_unbound_frame_budget_per_sec=3,
+        ws_unpaired_timeout_s=0.05,
+    )
+    decoded: list[str] = []
+    real_loads = json.loads
+
+    def counting_loads(raw, *args, **kwargs):
+        decoded.append(raw)
+        return real_loads(raw, *args, **kwargs)
+
+    monkeypatch.setattr(server_module.json, "loads", counting_loads)
+    frames = [b"\x00binary", "x" * 1024, "not json", "[1, 2]", _move(0)] + [_move(1)] * 5
+    ws = IdleWebSocket(frames)
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert decoded == ["not json", "[1, 2]", _move(0)]
+    assert server.metrics()["frame_rejections"] == {
+        "frame_type": 1,
+        "frame_size": 1,
+        "budget": 5,
+        "decode": 2,
+        "envelope": 0,
+    }
+
+
+def test_binding_switches_to_trusted_budget(tmp_path: Path) -> None:
+    server = _server(
+        tmp_path,
+        ws_frame_budget_per_sec=100,
+        ws_unbound_frame_budget_per_sec=1,
+        ws_idle_timeout_s=0.05,
+        rate_limit_per_sec=1000,
+    )
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = NullInputController()
+    ws = IdleWebSocket([_move(i) for i in range(10)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert len(ws.messages) == 10
+    assert server.metrics()["frame_rejections"]["budget"] == 0
+
+
+def test_per_ip_limit_rejects_extra_websocket(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_max_connections_per_ip=1, ws_unpaired_timeout_s=0.2)
+
+    async def run_test() -> IdleWebSocket:
+        first = IdleWebSocket()
+        task = asyncio.create_task(server.handle_connection(first))
+        await asyncio.sleep(0.01)
+        second = IdleWebSocket()
+        await server.handle_connection(second)
+        await task
+        return second
+
+    second = asyncio.run(run_test())
+
+    assert second.closed_with == (1013, "rejected_peer_limit")
+    assert server.metrics()["admission"]["rejected_peer_limit"] == 1
+    assert server.metrics()["admission"]["active"] == 0
+
+
+def test_unpaired_connection_is_closed(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_unpaired_timeout_s=0.05)
+    ws = IdleWebSocket()
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert ws.closed_with == (1008, "unpaired_closed")
+    assert server.metrics()["admission"]["unpaired_closed"] == 1
+
+
+def test_trusted_connection_is_reaped_when_idle(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_idle_timeout_s=0.05, ws_unpaired_timeout_s=0.05)
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = NullInputController()
+    ws = IdleWebSocket([_move(0)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert json.loads(ws.messages[0])["payload"]["success"] is True
+    assert ws.closed_with == (1001, "idle_closed")
+    assert server.metrics()["admission"]["idle_closed"] == 1
+    assert server.metrics()["admission"]["unpaired_closed"] == 0
+
+
+def test_reaped_trusted_device_resumes_without_pairing(tmp_path: Path) -> None:
+    # The web UI relies on this: trust belongs to the device ID, so a phone whose
+    # idle connection was reaped reconnects and sends input without the code.
+    server = _server(tmp_path, ws_idle_timeout_s=0.05, ws_unpaired_timeout_s=0.05)
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = NullInputController()
+    first = IdleWebSocket([_move(0)])
+    second = IdleWebSocket([_move(1)])
+
+    asyncio.run(server.handle_connection(first))
+    asyncio.run(server.handle_connection(second))
+
+    assert first.closed_with == (1001, "idle_closed")
+    assert json.loads(second.messages[0])["payload"]["success"] is True
+
+
+def test_ping_only_connection_is_reaped_when_idle(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_idle_timeout_s=0.1, ws_unpaired_timeout_s=0)
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = NullInputController()
+    ws = PingingWebSocket([_move(0), "not json", b"junk"])
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert ws.closed_with == (1001, "idle_closed")
+    assert any(json.loads(message)["type"] == "system.pong" for message in ws.messages)
+
+
+def test_static_server_rejects_over_per_ip_limit_and_reaps_idle(tmp_path: Path) -> None:
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+    (static_dir / "index.html").write_text("<h1>ok</h1>", encoding="utf-8")
+
+    async def run_test() -> tuple[bytes, bytes, dict]:
+        server = StaticUIHTTPServer(
+            host="127.0.0.1",
+            port=9084,
+            static_dir=static_dir,
+            max_connections_per_ip=1,
+            request_timeout_s=0.1,
+        )
+        task = asyncio.create_task(server.run())
+        await asyncio.sleep(0.05)
+        try:
+            idle_reader, idle_writer = await asyncio.open_connection("127.0.0.1", 9084)
+            await asyncio.sleep(0.02)
+            reader, writer = await asyncio.open_connection("127.0.0.1", 9084)
+            rejected = await reader.read()
+            writer.close()
+            idle_response = await idle_reader.read()
+            idle_writer.close()
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        return rejected, idle_response, server.admission.snapshot()
+
+    rejected, idle_response, snapshot = asyncio.run(run_test())
+
+    assert b"503 Service Unavailable" in rejected
+    assert idle_response == b""
+    assert snapshot["rejected_peer_limit"] == 1
+    assert snapshot["idle_closed"] == 1
+    assert snapshot["active"] == 0
@@ -0,0 +1,168 @@
+import logging
+import time
+from pathlib import Path
+
+from windows_agent import audit
+from windows_agent.audit import (
+    SegmentedAuditLog,
+    _compress_segment,
+    list_segments,
+    query_audit,
+)
+
+
+def _emit(handler: SegmentedAuditLog, ts: float, device_id: str | None, msg: str) -> None:
+    record = logging.LogRecord("windows_agent", logging.INFO, __file__, 0, msg, None, None)
+    record.created = ts
+    if device_id is not None:
+        record.device_id = device_id
+    handler.handle(record)
+
+
+def _fill(handler: SegmentedAuditLog, count: int) -> None:
+    for i in range(count):
+        _emit(handler, 1000.0 + i, f"dev-{i % 3}", f"action={i}")
+
+
+def test_segments_rotate_at_size_limit(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, segment_bytes=4096, compress=False)
+    _fill(handler, 200)
+    handler.close()
+
+    segments = list_segments(base)
+    assert len(segments) > 1
+    for segment in segments:
+        assert segment.log_path.stat().st_size <= 4096
+        assert segment.index_path.exists()
+    assert len(list(query_audit(base))) == 200
+
+
+def test_query_filters_by_time_and_device(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, segment_bytes=8192, compress=False)
+    _fill(handler, 900)
+    handler.close()
+
+    records = list(query_audit(base, since=1100.0, until=1110.0, device_id="dev-1"))
+
+    assert [r["ts"] for r in records] == [1100.0, 1103.0, 1106.0, 1109.0]
+    assert all(r["device_id"] == "dev-1" for r in records)
+
+
+def test_query_scans_unindexed_tail_of_active_segment(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, compress=False)
+    _fill(handler, 10)
+
+    records = list(query_audit(base, device_id="dev-0"))
+    handler.close()
+
+    assert [r["msg"] for r in records] == ["action=0", "action=3", "action=6", "action=9"]
+
+
+def test_compressed_segments_remain_queryable(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, segment_bytes=4096, compress=False)
+    _fill(handler, 200)
+    handler.close()
+
+    for segment in list_segments(base):
+        _compress_segment(segment)
+        assert not segment.log_path.exists()
+        assert segment.compressed_path.exists()
+
+    records = list(query_audit(base, since=1150.0, until=1152.0))
+    assert [r["msg"] for r in records] == ["action=150", "action=151", "action=152"]
+
+
+def test_rotation_compresses_sealed_segments(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, segment_bytes=4096, compress=True)
+    _fill(handler, 200)
+    handler.close()
+
+    first = list_segments(base)[0]
+    deadline = time.monotonic() + 5
+    while not first.compressed_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert first.compressed_path.exists()
+    assert len(list(query_audit(base))) == 200
+
+
+def test_retention_drops_oldest_segments(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, segment_bytes=4096, max_segments=2, compress=False)
+    _fill(handler, 300)
+    handler.close()
+
+    segments = list_segments(base)
+    assert len(segments) == 2
+    assert segments[0].seq > 1
+    records = list(query_audit(base))
+    assert records[-1]["msg"] == "action=299"
+    assert len(records) < 300
+
+
+def _wait_for_file(path: Path) -> None:
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_restart_seals_and_compresses_earlier_segments(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    crashed = SegmentedAuditLog(base, compress=False)
+    _fill(crashed, 10)
+    # Simulate an unclean shutdown: nothing indexed, no seal marker.
+    crashed._file.close()
+    crashed._index.close()
+
+    handler = SegmentedAuditLog(base, compress=True)
+    first = list_segments(base)[0]
+    _wait_for_file(first.compressed_path)
+    _emit(handler, 2000.0, "dev-0", "after_restart")
+    handler.close()
+
+    assert first.compressed_path.exists()
+    assert not first.log_path.exists()
+    assert audit._read_index(first)[1] is True
+    records = list(query_audit(base, device_id="dev-0"))
+    assert [r["msg"] for r in records] == [
+        "action=0",
+        "action=3",
+        "action=6",
+        "action=9",
+        "after_restart",
+    ]
+
+
+def test_restart_applies_retention(tmp_path: Path) -> None:
+    base = tmp_path / "audit.log"
+    for _ in range(4):
+        handler = SegmentedAuditLog(base, max_segments=0, compress=False)
+        _fill(handler, 3)
+        handler.close()
+
+    handler = SegmentedAuditLog(base, max_segments=2, compress=False)
+    handler.close()
+
+    assert [segment.seq for segment in list_segments(base)] == [4, 5]
+
+
+def test_compression_skips_segment_removed_by_retention(tmp_path: Path, monkeypatch) -> None:
+    base = tmp_path / "audit.log"
+    handler = SegmentedAuditLog(base, compress=False)
+    _fill(handler, 3)
+    handler.close()
+    segment = list_segments(base)[0]
+    copy = audit.shutil.copyfileobj
+
+    def copy_then_remove(src, dst) -> None:
+        copy(src, dst)
+        segment.remove()
+
+    monkeypatch.setattr(audit.shutil, "copyfileobj", copy_then_remove)
+    _compress_segment(segment)
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,184 @@
+import asyncio
+import json
+from pathlib import Path
+
+from windows_agent import security
+from windows_agent.config import AgentConfig
+from windows_agent.replay import RecordingInputController
+from windows_agent.security import DeviceStateTable, NonceTracker, RateLimiter
+from windows_agent.server import WindowsAgentServer
+
+
+class DummyWebSocket:
+    def __init__(self, frames: list[str]) -> None:
+        self.frames = frames
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def test_table_evicts_least_recently_used() -> None:
+    table = DeviceStateTable(max_devices=3, idle_ttl_s=0)
+    for device_id in ("a", "b", "c"):
+        table.get(device_id)
+    table.get("a")
+    table.get("d")
+
+    assert len(table) == 3
+    assert table.peek("b") is None
+    assert table.peek("a") is not None
+    assert table.snapshot()["evicted_lru"] == 1
+
+
+def test_table_evicts_idle_entries(monkeypatch) -> None:
+    clock = [1000.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: clock[0])
+    table = DeviceStateTable(max_devices=10, idle_ttl_s=60)
+    table.get("old")
+    clock[0] += 30
+    table.get("recent")
+    clock[0] += 45
+    table.get("new")
+
+    assert table.peek("old") is None
+    assert table.peek("recent") is not None
+    assert table.snapshot()["evicted_idle"] == 1
+
+
+def test_nonce_and_rate_state_share_one_entry() -> None:
+    table = DeviceStateTable()
+    nonces = NonceTracker(states=table)
+    limiter = RateLimiter(2, states=table)
+
+    assert nonces.is_fresh(device_id="dev", nonce="n1")
+    assert not nonces.is_fresh(device_id="dev", nonce="n1")
+    assert limiter.allow("dev")
+    assert limiter.allow("dev")
+    assert not limiter.allow("dev")
+    assert len(table) == 1
+    assert table.snapshot()["approx_bytes"] > 0
+
+
+def test_nonce_window_forgets_oldest() -> None:
+    tracker = NonceTracker(states=DeviceStateTable(max_nonces=2))
+
+    assert tracker.is_fresh(device_id="dev", nonce="n1")
+    assert tracker.is_fresh(device_id="dev", nonce="n2")
+    assert tracker.is_fresh(device_id="dev", nonce="n3")
+    assert tracker.is_fresh(device_id="dev", nonce="n1")
+    assert not tracker.is_fresh(device_id="dev", nonce="n3")
+
+
+def test_nonce_count_tracks_window_and_eviction() -> None:
+    table = DeviceStateTable(max_devices=2, idle_ttl_s=0, max_nonces=3)
+    tracker = NonceTracker(states=table)
+    for i in range(5):
+        tracker.is_fresh(device_id="a", nonce=f"a{i}")
+    tracker.is_fresh(device_id="b", nonce="b0")
+    tracker.is_fresh(device_id="b", nonce="b0")
+    assert table.nonce_count == 4
+
+    tracker.is_fresh(device_id="c", nonce="c0")
+    snapshot = table.snapshot()
+
+    assert snapshot["nonces"] == 2
+    assert snapshot["approx_bytes"] == 2 * security.DEVICE_STATE_BYTES + 2 * security.NONCE_BYTES
+
+
+def test_invented_device_ids_do_not_grow_state(tmp_path: Path) -> None:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+        device_state_max=50,
+        ws_unbound_frame_budget_per_sec=0,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    frames = [
+        json.dumps(
+            {
+                "protocol_version": "1.0",
+                "type": "pair.request",
+                "id": f"id-{i}",
+                "ts": 1735689600000,
+                "nonce": "nonce",
+                "device_id": f"invented-{i}",
+                "payload": {"device_name": "x", "public_key": "y"},
+            }
+        )
+        for i in range(500)
+    ]
+
+    asyncio.run(server.handle_connection(DummyWebSocket(frames)))
+
+    snapshot = server.metrics()["device_states"]
+    assert snapshot["devices"] == 50
+    assert snapshot["evicted_lru"] == 450
+
+
+def test_trusted_devices_are_never_evicted() -> None:
+    table = DeviceStateTable(max_devices=2, idle_ttl_s=0, is_pinned=lambda d: d == "phone")
+    tracker = NonceTracker(states=table)
+    assert tracker.is_fresh(device_id="phone", nonce="n1")
+    for i in range(10):
+        table.get(f"invented-{i}")
+
+    assert not tracker.is_fresh(device_id="phone", nonce="n1")
+    assert table.snapshot()["pinned"] == 1
+    assert len(table) == 3
+
+
+def test_untrusted_flood_does_not_reopen_trusted_replay(tmp_path: Path) -> None:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+        device_state_max=50,
+        ws_unbound_frame_budget_per_sec=0,
+        ws_frame_budget_per_sec=0,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="phone", device_name="Phone", public_key="pk")
+    server.input_controller = RecordingInputController()
+    captured = json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.keypress",
+            "id": "id-captured",
+            "ts": 1735689600000,
+            "nonce": "captured-nonce",
+            "device_id": "phone",
+            "payload": {"key": "a", "action": "down"},
+        }
+    )
+    flood = [
+        json.dumps(
+            {
+                "protocol_version": "1.0",
+                "type": "pair.request",
+                "id": f"id-{i}",
+                "ts": 1735689600000,
+                "nonce": "nonce",
+                "device_id": f"invented-{i}",
+                "payload": {"device_name": "x", "public_key": "y"},
+            }
+        )
+        for i in range(500)
+    ]
+
+    asyncio.run(server.handle_connection(DummyWebSocket([captured, *flood, captured])))
+
+    assert server.input_controller.events == [["keypress", {"key": "a", "action": "down"}]]
+    assert server.metrics()["device_states"]["evicted_lru"] >= 450
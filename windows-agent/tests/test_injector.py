@@ -0,0 +1,287 @@
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+from websockets.asyncio.client import connect
+
+from windows_agent.config import AgentConfig
+from windows_agent.input_ring import InjectorBusy, InputRing, RingInputController, inject_record
+from windows_agent.replay import RecordingInputController
+from windows_agent.server import WindowsAgentServer
+
+BENCH_FRAMES = 300
+INJECT_COST_S = 0.0003
+
+
+class FileRecordingController(RecordingInputController):
+    # Runs inside the injector process; each event is appended to a file so the
+    # test process can see what was injected.
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def keypress(self, *, key: str, action: str) -> None:
+        if key == "crash":
+            raise SystemExit(3)
+        if key == "bad":
+            raise ValueError("injection failed")
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps([key, action]) + "\n")
+
+
+class StuckController:
+    # Never returns in time, so shutdown has to wait out STOP_TIMEOUT_S.
+    def keypress(self, *, key: str, action: str) -> None:
+        time.sleep(30)
+
+
+class BusyController:
+    # Stands in for pyautogui: holds the CPU (and the GIL) for each injection.
+    def __init__(self) -> None:
+        self.injected = 0
+
+    def keypress(self, *, key: str, action: str) -> None:
+        deadline = time.perf_counter() + INJECT_COST_S
+        while time.perf_counter() < deadline:
+            pass
+        self.injected += 1
+
+
+class FrameFeed:
+    def __init__(self, frames: list[str]) -> None:
+        self.frames = frames
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def _keypress(i: int, key: str = "a") -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.keypress",
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": "android-1",
+            "payload": {"key": key, "action": "down" if i % 2 == 0 else "up"},
+        }
+    )
+
+
+def _server(tmp_path: Path, **overrides) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=0,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        rate_limit_per_sec=100_000,
+        ws_frame_budget_per_sec=0,
+        show_pairing_window=False,
+        **overrides,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    return server
+
+
+async def _wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.01)
+
+
+async def _stop(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_ring_round_trips_records_and_refuses_when_full() -> None:
+    ctx = multiprocessing.get_context("spawn")
+    ring = InputRing.create(ctx, slots=4)
+    producer = RingInputController()
+    producer.ring = ring
+    try:
+        producer.mouse_move(dx=1.5, dy=-2.0)
+        producer.mouse_click(button="left", action="down")
+        producer.text(text="héllo ✓")
+        producer.system_media(command="mute")
+        assert ring.depth() == 4
+        with pytest.raises(InjectorBusy):
+            producer.keypress(key="a", action="up")
+        with pytest.raises(ValueError):
+            producer.mouse_click(button="left", action="press")
+
+        recorder = RecordingInputController()
+        for _ in range(4):
+            inject_record(recorder, ring.get(timeout=0))
+        assert ring.get(timeout=0) is None
+        producer.keypress(key="enter", action="up")
+        inject_record(recorder, ring.get(timeout=0))
+    finally:
+        ring.close(unlink=True)
+
+    assert recorder.events == [
+        ["mouse_move", {"dx": 1.5, "dy": -2.0}],
+        ["mouse_click", {"button": "left", "action": "down"}],
+        ["text", {"text": "héllo ✓"}],
+        ["system_media", {"command": "mute"}],
+        ["keypress", {"key": "enter", "action": "up"}],
+    ]
+
+
+def test_injector_process_drains_ring_and_restarts_after_crash(tmp_path: Path, caplog) -> None:
+    server = _server(tmp_path, injector_process=True)
+    injected = tmp_path / "injected.jsonl"
+    server.injector.controller_factory = functools.partial(FileRecordingController, str(injected))
+
+    def lines() -> list:
+        if not injected.exists():
+            return []
+        return [json.loads(line) for line in injected.read_text(encoding="utf-8").splitlines()]
+
+    async def run_test() -> tuple[list, list, int]:
+        task = asyncio.create_task(server.injector.run())
+        try:
+            await _wait_for(lambda: server.injector.controller.ring is not None)
+            first = FrameFeed([_keypress(i) for i in range(4)] + [_keypress(4, key="crash")])
+            await server.handle_connection(first)
+            await _wait_for(lambda: server.injector.restarts == 1)
+            second = FrameFeed([_keypress(i) for i in range(5, 9)] + [_keypress(9, key="bad")])
+            await server.handle_connection(second)
+            await _wait_for(lambda: server.metrics()["injector"]["errors"] == 1)
+            await asyncio.sleep(0.2)
+            return first.messages + second.messages, lines(), server.metrics()["injector"]
+        finally:
+            await _stop(task)
+
+    with caplog.at_level(logging.INFO, logger="windows_agent"):
+        acks, events, snapshot = asyncio.run(run_test())
+
+    # Acks mean "accepted for injection": the crashing and failing events were
+    # acked too, and only the audit log shows what happened to them.
+    assert all(json.loads(ack)["payload"]["success"] for ack in acks)
+    assert events == [["a", "down" if i % 2 == 0 else "up"] for i in range(9) if i != 4]
+    assert snapshot["restarts"] == 1
+    assert snapshot["alive"] is True
+    assert snapshot["queue_depth"] == 0
+    assert server.injector.ring is None
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum("action=queued:input.keypress" in message for message in messages) == 10
+    assert not any(message.endswith("action=input.keypress") for message in messages)
+    assert any(message.startswith("injector_exited exitcode=3") for message in messages)
+    assert "injection_failed count=1 total=1" in messages
+
+
+def test_injector_shutdown_does_not_block_the_event_loop(tmp_path: Path) -> None:
+    server = _server(tmp_path, injector_process=True)
+    server.injector.controller_factory = StuckController
+
+    async def run_test() -> tuple[float, bool]:
+        task = asyncio.create_task(server.injector.run())
+        await _wait_for(lambda: server.injector.controller.ring is not None)
+        process = server.injector._process
+        await server.handle_connection(FrameFeed([_keypress(0)]))
+        await _wait_for(lambda: server.injector.queue_depth() == 0)
+        gaps = []
+
+        async def tick() -> None:
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(tick())
+        await _stop(task)
+        await _stop(ticker)
+        return max(gaps), process.is_alive()
+
+    max_gap, alive = asyncio.run(run_test())
+
+    assert max_gap < 0.5
+    assert not alive
+    assert server.injector.ring is None
+
+
+def test_full_ring_replies_injector_busy(tmp_path: Path) -> None:
+    server = _server(tmp_path, injector_process=True, injector_ring_slots=16)
+    ctx = multiprocessing.get_context("spawn")
+    server.injector.controller.ring = InputRing.create(ctx, slots=1)
+
+    ws = FrameFeed([_keypress(0), _keypress(1)])
+    try:
+        asyncio.run(server.handle_connection(ws))
+    finally:
+        server.injector.controller.ring.close(unlink=True)
+
+    replies = [json.loads(message)["payload"] for message in ws.messages]
+    assert replies[0]["success"] is True
+    assert replies[1]["reason"] == "injector_busy"
+    assert replies[1]["retry_after_ms"] > 0
+
+
+async def _bench(server: WindowsAgentServer, injected) -> tuple[float, float]:
+    async with server.serve() as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        async with connect(f"ws://127.0.0.1:{port}/") as ws:
+            latencies = []
+            start = time.perf_counter()
+            for i in range(BENCH_FRAMES):
+                sent = time.perf_counter()
+                await ws.send(_keypress(i))
+                await ws.recv()
+                latencies.append(time.perf_counter() - sent)
+            await _wait_for(lambda: injected() == BENCH_FRAMES)
+            total = time.perf_counter() - start
+    return statistics.median(latencies), total
+
+
+def test_benchmark_two_process_against_single_process(tmp_path: Path) -> None:
+    single = _server(tmp_path / "single")
+    single.input_controller = BusyController()
+    split = _server(tmp_path / "split", injector_process=True)
+    split.injector.controller_factory = BusyController
+
+    async def run_test() -> tuple[tuple[float, float], tuple[float, float]]:
+        single_result = await _bench(single, lambda: single.input_controller.injected)
+        task = asyncio.create_task(split.injector.run())
+        try:
+            await _wait_for(lambda: split.injector.controller.ring is not None)
+            split_result = await _bench(split, lambda: split.metrics()["injector"]["injected"])
+        finally:
+            await _stop(task)
+        return single_result, split_result
+
+    (single_p50, single_total), (split_p50, split_total) = asyncio.run(run_test())
+
+    # Two-process acks are sent once the event is queued, so their latency is not
+    # comparable with single-process acks; the drain time (first send until every
+    # event has been injected) is the like-for-like figure.
+    print(
+        f"\nsingle-process: ack (injected) p50={single_p50 * 1e6:.0f}us"
+        f" drain={single_total * 1000:.1f}ms"
+        f"\ntwo-process:    ack (queued) p50={split_p50 * 1e6:.0f}us"
+        f" drain={split_total * 1000:.1f}ms"
+    )
+    assert single.input_controller.injected == BENCH_FRAMES
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from windows_agent.config import AgentConfig
+from windows_agent.input_control import MAX_TEXT_LENGTH, InputController
+from windows_agent.server import WindowsAgentServer
+
+
+class DummyWebSocket:
+    def __init__(self, frames: list[str] | None = None) -> None:
+        self.frames = frames or []
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+class RecordingPyAutoGUI:
+    KEYBOARD_KEYS = [chr(c) for c in range(0x20, 0x7F)] + ["\n", "\t", "enter", "tab"]
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, str]] = []
+
+    def write(self, text: str, interval: float = 0.0, _pause: bool = True) -> None:
+        self.calls.append(("write", text))
+
+
+class RecordingInputController(InputController):
+    def __init__(self) -> None:
+        self.backend = RecordingPyAutoGUI()
+
+    def _pyautogui(self):
+        return self.backend
+
+    def _send_unicode(self, text: str) -> None:
+        self.backend.calls.append(("unicode", text))
+
+
+def _server(tmp_path: Path) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = RecordingInputController()
+    return server
+
+
+def _text_frame(i: int, text) -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.text",
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": "android-1",
+            "payload": {"text": text},
+        }
+    )
+
+
+def test_text_ascii_is_written_in_one_call() -> None:
+    controller = RecordingInputController()
+    controller.text(text="https://example.com/?q=1")
+    assert controller.backend.calls == [("write", "https://example.com/?q=1")]
+
+
+def test_text_splits_unicode_runs() -> None:
+    controller = RecordingInputController()
+    controller.text(text="café \U0001f600!")
+    assert controller.backend.calls == [
+        ("write", "caf"),
+        ("unicode", "é"),
+        ("write", " "),
+        ("unicode", "\U0001f600"),
+        ("write", "!"),
+    ]
+
+
+def test_text_is_nfc_normalized() -> None:
+    controller = RecordingInputController()
+    controller.text(text="café")
+    assert controller.backend.calls == [("write", "caf"), ("unicode", "é")]
+
+
+@pytest.mark.parametrize("text", ["", "a" * (MAX_TEXT_LENGTH + 1), "bell\x07"])
+def test_text_rejects_invalid_input(text: str) -> None:
+    with pytest.raises(ValueError):
+        RecordingInputController().text(text=text)
+
+
+def test_sentence_counts_as_single_weighted_action(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    sentence = "the quick brown fox jumps over the lazy dog"
+    ws = DummyWebSocket([_text_frame(i, sentence) for i in range(10)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    results = [json.loads(m)["payload"] for m in ws.messages]
+    assert all(r["success"] for r in results)
+    assert server.input_controller.backend.calls == [("write", sentence)] * 10
+
+
+def test_long_text_uses_more_rate_budget(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    ws = DummyWebSocket([_text_frame(i, "x" * MAX_TEXT_LENGTH) for i in range(10)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    reasons = [json.loads(m)["payload"]["reason"] for m in ws.messages]
+    assert reasons.count(None) == 3
+    assert reasons.count("rate_limit_exceeded") == 7
+
+
+@pytest.mark.parametrize("text", [42, "", "x" * (MAX_TEXT_LENGTH + 1)])
+def test_invalid_text_payload_rejected(tmp_path: Path, text) -> None:
+    server = _server(tmp_path)
+    ws = DummyWebSocket([_text_frame(0, text)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    result = json.loads(ws.messages[-1])["payload"]
+    assert result["success"] is False
+    assert result["reason"] == "invalid_text"
+    assert server.input_controller.backend.calls == []
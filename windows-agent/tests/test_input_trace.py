@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+from windows_agent.config import AgentConfig
+from windows_agent.input_trace import TraceEvent, load_trace
+from windows_agent.replay import RecordingInputController, diff_injected, replay_trace
+from windows_agent.server import WindowsAgentServer
+
+
+class DummyWebSocket:
+    def __init__(self, frames: list[str]) -> None:
+        self.frames = frames
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def _frame(i: int, msg_type: str, payload: dict, device_id: str = "android-1") -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": msg_type,
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": device_id,
+            "payload": payload,
+        }
+    )
+
+
+def _capture(tmp_path: Path, frames: list[str]) -> Path:
+    trace_path = tmp_path / "session.trace"
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+        trace_capture_path=trace_path,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = RecordingInputController()
+    asyncio.run(server.handle_connection(DummyWebSocket(frames)))
+    server.trace_writer.close()
+    return trace_path
+
+
+def test_capture_records_only_accepted_input(tmp_path: Path) -> None:
+    frames = [
+        _frame(0, "input.mouse_move", {"dx": 3, "dy": -1}),
+        _frame(1, "input.mouse_move", {"dx": 1, "dy": 1}, device_id="stranger"),
+        _frame(0, "input.mouse_click", {"button": "left", "action": "down"}),
+        _frame(2, "input.text", {"text": "hello"}),
+    ]
+    events = load_trace(_capture(tmp_path, frames))
+
+    assert [e.message["type"] for e in events] == ["input.mouse_move", "input.text"]
+    assert events[0].offset == 0.0
+    assert events[1].offset >= events[0].offset
+
+
+def test_replay_reproduces_injected_sequence(tmp_path: Path) -> None:
+    frames = [_frame(i, "input.mouse_move", {"dx": i, "dy": -i}) for i in range(20)]
+    frames.append(_frame(20, "input.text", {"text": "https://example.com"}))
+    events = load_trace(_capture(tmp_path, frames))
+
+    report = asyncio.run(replay_trace(events))
+
+    assert report.frames == 21
+    assert len(report.latencies) == 21
+    assert report.injected[0] == ["mouse_move", {"dx": 0.0, "dy": 0.0}]
+    assert report.injected[-1] == ["text", {"text": "https://example.com"}]
+    assert report.summary()["throughput_per_sec"] > 0
+
+
+def test_replay_honours_speed_multiplier() -> None:
+    events = [
+        TraceEvent(
+            offset=0.0,
+            message=json.loads(_frame(0, "input.keypress", {"key": "a", "action": "down"})),
+        ),
+        TraceEvent(
+            offset=0.2,
+            message=json.loads(_frame(1, "input.keypress", {"key": "a", "action": "up"})),
+        ),
+    ]
+
+    report = asyncio.run(replay_trace(events, speed=2.0))
+
+    assert report.elapsed_s >= 0.1
+    assert [e[1]["action"] for e in report.injected] == ["down", "up"]
+
+
+def test_replay_closes_its_audit_handler(monkeypatch) -> None:
+    # Fresh logger state, as in the replay CLI: the replay server attaches the
+    # audit handler inside its temporary directory.
+    logger = logging.getLogger("windows_agent")
+    monkeypatch.setattr(logger, "handlers", [])
+    events = [
+        TraceEvent(
+            offset=0.0,
+            message=json.loads(_frame(0, "input.keypress", {"key": "a", "action": "down"})),
+        )
+    ]
+    opened = []
+    original_add = logger.addHandler
+    monkeypatch.setattr(logger, "addHandler", lambda h: (opened.append(h), original_add(h)))
+
+    report = asyncio.run(replay_trace(events))
+
+    assert report.injected == [["keypress", {"key": "a", "action": "down"}]]
+    assert len(opened) == 1
+    assert logger.handlers == []
+    assert opened[0]._file.closed
+
+
+def test_diff_injected_reports_first_mismatch() -> None:
+    baseline = [
+        ["keypress", {"key": "a", "action": "down"}],
+        ["keypress", {"key": "a", "action": "up"}],
+    ]
+
+    assert diff_injected(baseline, list(baseline)) is None
+    assert diff_injected(baseline, baseline[:1]) == {
+        "index": 1,
+        "baseline": baseline[1],
+        "current": None,
+    }
+    changed = [baseline[0], ["keypress", {"key": "b", "action": "up"}]]
+    assert diff_injected(baseline, changed)["index"] == 1
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import socket
+import stat
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from websockets.asyncio.client import connect, unix_connect
+
+from windows_agent.config import AgentConfig
+from windows_agent.server import WindowsAgentServer
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets only")
+
+BENCH_FRAMES = 200
+
+
+class RecordingInputController:
+    def __init__(self) -> None:
+        self.keys: list[tuple[str, str]] = []
+
+    def keypress(self, *, key: str, action: str) -> None:
+        self.keys.append((key, action))
+
+
+def _server(tmp_path: Path) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=0,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        rate_limit_per_sec=100_000,
+        ws_frame_budget_per_sec=0,
+        show_pairing_window=False,
+        ipc_socket_path=tmp_path / "agent.sock",
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="local-tool", device_name="Tool", public_key="pk")
+    server.input_controller = RecordingInputController()
+    return server
+
+
+def _keypress(i: int) -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.keypress",
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": "local-tool",
+            "payload": {"key": "a", "action": "down" if i % 2 == 0 else "up"},
+        }
+    )
+
+
+async def _start_ipc(server: WindowsAgentServer) -> asyncio.Task:
+    task = asyncio.create_task(server.run_ipc())
+    for _ in range(100):
+        if server.config.ipc_socket_path.exists():
+            break
+        await asyncio.sleep(0.01)
+    return task
+
+
+async def _stop(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_ipc_socket_serves_protocol_with_owner_only_mode(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    socket_path = server.config.ipc_socket_path
+
+    async def run_test() -> tuple[dict, int]:
+        task = await _start_ipc(server)
+        try:
+            mode = stat.S_IMODE(socket_path.stat().st_mode)
+            async with unix_connect(str(socket_path)) as ws:
+                await ws.send(_keypress(0))
+                reply = json.loads(await ws.recv())
+        finally:
+            await _stop(task)
+        return reply, mode
+
+    reply, mode = asyncio.run(run_test())
+
+    assert reply["payload"]["success"] is True
+    assert mode == 0o600
+    assert server.input_controller.keys == [("a", "down")]
+    assert not socket_path.exists()
+
+
+def test_ipc_replaces_stale_socket_file(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    socket_path = server.config.ipc_socket_path
+
+    async def run_once() -> dict:
+        task = asyncio.create_task(server.run_ipc())
+        try:
+            for _ in range(100):
+                try:
+                    async with unix_connect(str(socket_path)) as ws:
+                        await ws.send(_keypress(0))
+                        return json.loads(await ws.recv())
+                except ConnectionRefusedError:
+                    await asyncio.sleep(0.01)
+            raise TimeoutError
+        finally:
+            await _stop(task)
+
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(socket_path))
+    stale.close()
+
+    assert asyncio.run(run_once())["payload"]["success"] is True
+    # Neither the socket nor the staging directory it was bound in is left behind.
+    assert not socket_path.exists()
+    assert not [entry for entry in tmp_path.iterdir() if entry.is_dir()]
+
+
+def test_ipc_refuses_windows_with_clear_error(tmp_path: Path, monkeypatch) -> None:
+    server = _server(tmp_path)
+    monkeypatch.setattr(sys, "platform", "win32")
+
+    with pytest.raises(RuntimeError, match="Unix domain sockets"):
+        asyncio.run(server.run_ipc())
+
+
+async def _round_trips(ws) -> float:
+    latencies = []
+    for i in range(BENCH_FRAMES):
+        sent = time.perf_counter()
+        await ws.send(_keypress(i))
+        await ws.recv()
+        latencies.append(time.perf_counter() - sent)
+    return statistics.median(latencies)
+
+
+def test_benchmark_ipc_against_tcp(tmp_path: Path) -> None:
+    tcp_server = _server(tmp_path / "tcp")
+    ipc_server = _server(tmp_path / "ipc")
+
+    async def run_test() -> tuple[float, float]:
+        async with tcp_server.serve() as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}/") as ws:
+                tcp_p50 = await _round_trips(ws)
+        task = await _start_ipc(ipc_server)
+        try:
+            async with unix_connect(str(ipc_server.config.ipc_socket_path)) as ws:
+                ipc_p50 = await _round_trips(ws)
+        finally:
+            await _stop(task)
+        return tcp_p50, ipc_p50
+
+    tcp_p50, ipc_p50 = asyncio.run(run_test())
+
+    print(f"\ntcp p50={tcp_p50 * 1e6:.0f}us\nipc p50={ipc_p50 * 1e6:.0f}us")
+    assert len(tcp_server.input_controller.keys) == BENCH_FRAMES
+    assert len(ipc_server.input_controller.keys) == BENCH_FRAMES
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+from windows_agent import server as server_module
+from windows_agent.config import AgentConfig
+from windows_agent.latency import LatencyProbe
+from windows_agent.server import ConnectionState, WindowsAgentServer
+
+
+class DummyWebSocket:
+    def __init__(self, frames: list) -> None:
+        self.frames = frames
+        self.messages: list[str] = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame() if callable(frame) else frame
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def _server(tmp_path: Path) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=8765,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        show_pairing_window=False,
+    )
+    return WindowsAgentServer(config=cfg, pairing_code="123456")
+
+
+def _ping(payload: dict, nonce: str = "nonce-ping") -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "system.ping",
+            "id": "id-ping",
+            "ts": 1735689600000,
+            "nonce": nonce,
+            "device_id": "android-1",
+            "payload": payload,
+        }
+    )
+
+
+@pytest.fixture(autouse=True)
+def _no_ping_throttle(monkeypatch) -> None:
+    monkeypatch.setattr(server_module, "PING_MIN_INTERVAL_S", 0.0)
+
+
+def test_ping_gets_pong_without_audit_or_ack(tmp_path: Path, caplog) -> None:
+    server = _server(tmp_path)
+    ws = DummyWebSocket([_ping({"client_ts": 1000.0})])
+
+    with caplog.at_level(logging.INFO, logger="windows_agent"):
+        asyncio.run(server.handle_connection(ws))
+
+    assert len(ws.messages) == 1
+    pong = json.loads(ws.messages[0])
+    assert pong["type"] == "system.pong"
+    assert pong["payload"]["client_ts"] == 1000.0
+    assert pong["payload"]["server_tx_ts"] >= pong["payload"]["server_rx_ts"]
+    assert "action=" not in caplog.text
+
+
+def test_ping_does_not_consume_nonce_or_rate_budget(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    server.rate_limiter.limit_per_sec = 1
+    ws = DummyWebSocket([_ping({"client_ts": float(i)}, nonce="same") for i in range(5)])
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert [json.loads(m)["type"] for m in ws.messages] == ["system.pong"] * 5
+    assert server.rate_limiter.allow("android-1")
+
+
+def test_follow_up_ping_completes_rtt_sample(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    probe = LatencyProbe()
+    conn = ConnectionState(probe=probe)
+    ws = DummyWebSocket([_ping({"client_ts": 1000.0})])
+    asyncio.run(server._handle_frames(ws, conn))
+    first = json.loads(ws.messages[0])["payload"]
+    hold = first["server_tx_ts"] - first["server_rx_ts"]
+
+    follow_up = {"client_ts": 3000.0, "prev_client_ts": 1000.0, "prev_client_rx_ts": 1040.0 + hold}
+    asyncio.run(server._handle_frames(DummyWebSocket([_ping(follow_up)]), conn))
+
+    snapshot = probe.snapshot()
+    assert snapshot["samples"] == 1
+    assert snapshot["rtt_ms_last"] == pytest.approx(40.0, abs=0.01)
+    assert snapshot["offset_ms"] == pytest.approx(first["server_rx_ts"] - 1020.0, abs=0.01)
+
+
+def test_unknown_prev_exchange_is_ignored() -> None:
+    probe = LatencyProbe()
+    probe.record_pong(client_ts=1.0, server_rx_ts=5.0, server_tx_ts=6.0)
+
+    assert probe.observe(client_ts=2.0, client_rx_ts=9.0) is False
+    assert probe.snapshot()["samples"] == 0
+
+
+def test_metrics_report_open_connection_probes(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    seen = []
+    ws = DummyWebSocket(
+        [
+            _ping({"client_ts": 1000.0}),
+            lambda: seen.append(server.metrics()) or _ping({"client_ts": 2000.0}),
+        ]
+    )
+
+    asyncio.run(server.handle_connection(ws))
+
+    assert seen[0]["connections"] == 1
+    assert seen[0]["network_rtt"][0]["samples"] == 0
+    assert server.metrics()["connections"] == 0
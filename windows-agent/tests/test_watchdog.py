@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from windows_agent.audit import SegmentedAuditLog, query_audit
+from windows_agent.watchdog import LoopWatchdog
+
+
+def _blocking_call() -> None:
+    time.sleep(0.3)
+
+
+def test_watchdog_logs_stack_of_blocking_call(caplog) -> None:
+    watchdog = LoopWatchdog(interval_ms=10, threshold_ms=50)
+
+    async def run_test() -> None:
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.05)
+        _blocking_call()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    watchdog.logger.addHandler(caplog.handler)
+    try:
+        asyncio.run(run_test())
+    finally:
+        watchdog.logger.removeHandler(caplog.handler)
+
+    assert watchdog.blocks == 1
+    assert "event_loop_blocked duration_ms=" in caplog.text
+    assert "_blocking_call" in caplog.text
+    snapshot = watchdog.snapshot()
+    assert snapshot["max_ms"] >= 200
+    assert snapshot["samples"] > 1
+
+
+def test_watchdog_quiet_loop_reports_no_blocks(caplog) -> None:
+    watchdog = LoopWatchdog(interval_ms=10, threshold_ms=200)
+
+    async def run_test() -> None:
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    watchdog.logger.addHandler(caplog.handler)
+    try:
+        asyncio.run(run_test())
+    finally:
+        watchdog.logger.removeHandler(caplog.handler)
+
+    assert watchdog.blocks == 0
+    assert "event_loop_blocked" not in caplog.text
+    assert watchdog.snapshot()["p50_ms"] is not None
+
+
+def test_watchdog_stops_without_blocking() -> None:
+    watchdog = LoopWatchdog(interval_ms=1000, threshold_ms=250)
+
+    async def run_test() -> float:
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return time.monotonic() - started
+
+    assert asyncio.run(run_test()) < 0.5
+
+
+def test_blocked_loop_report_stays_out_of_audit_log(tmp_path: Path, monkeypatch, caplog) -> None:
+    base = tmp_path / "audit.log"
+    audit = SegmentedAuditLog(base, compress=False)
+    monkeypatch.setattr(logging.getLogger("windows_agent"), "handlers", [audit])
+    watchdog = LoopWatchdog(interval_ms=10, threshold_ms=50)
+
+    async def run_test() -> None:
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.05)
+        _blocking_call()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    watchdog.logger.addHandler(caplog.handler)
+    try:
+        asyncio.run(run_test())
+    finally:
+        watchdog.logger.removeHandler(caplog.handler)
+        audit.close()
+
+    assert watchdog.blocks == 1
+    assert "event_loop_blocked" in caplog.text
+    assert not [r for r in query_audit(base) if "event_loop_blocked" in r["msg"]]
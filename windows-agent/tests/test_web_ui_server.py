@@ -1,4 +1,5 @@
 import asyncio
+import json
 from pathlib import Path
 
 from windows_agent.web_ui_server import StaticUIHTTPServer
@@ -93,3 +94,33 @@ def test_repo_static_files_exist() -> None:
     assert (static_dir / "index.html").exists()
     assert (static_dir / "app.js").exists()
     assert (static_dir / "styles.css").exists()
+
+
+def test_static_server_serves_metrics(tmp_path: Path) -> None:
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+
+    async def run_test() -> None:
+        server = StaticUIHTTPServer(
+            host="127.0.0.1",
+            port=9083,
+            static_dir=static_dir,
+            metrics_provider=lambda: {"connections": 2},
+        )
+        task = asyncio.create_task(server.run())
+        await asyncio.sleep(0.05)
+        try:
+            response = await _http_get(9083, "/metrics")
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        assert b"200 OK" in response
+        assert b"application/json" in response
+        metrics = json.loads(response.split(b"\r\n\r\n", maxsplit=1)[1])
+        assert metrics["connections"] == 2
+        assert metrics["web_ui_admission"]["active"] == 1
+
+    asyncio.run(run_test())
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from websockets.asyncio.client import connect
+
+from windows_agent.config import AgentConfig
+from windows_agent.server import WindowsAgentServer
+
+BENCH_FRAMES = 300
+
+
+class RecordingInputController:
+    def __init__(self) -> None:
+        self.moves: list[tuple[float, float]] = []
+
+    def mouse_move(self, *, dx: float, dy: float) -> None:
+        self.moves.append((dx, dy))
+
+
+def _server(tmp_path: Path, **overrides) -> WindowsAgentServer:
+    cfg = AgentConfig(
+        host="127.0.0.1",
+        port=0,
+        trusted_registry_path=tmp_path / "trusted.json",
+        audit_log_path=tmp_path / "audit.log",
+        rate_limit_per_sec=100_000,
+        ws_frame_budget_per_sec=0,
+        show_pairing_window=False,
+        **overrides,
+    )
+    server = WindowsAgentServer(config=cfg, pairing_code="123456")
+    server.registry.trust_device(device_id="android-1", device_name="Phone", public_key="pk")
+    server.input_controller = RecordingInputController()
+    return server
+
+
+def _move_frame(i: int) -> str:
+    return json.dumps(
+        {
+            "protocol_version": "1.0",
+            "type": "input.mouse_move",
+            "id": f"id-{i}",
+            "ts": 1735689600000 + i,
+            "nonce": f"nonce-{i}",
+            "device_id": "android-1",
+            "payload": {"dx": i % 7, "dy": -(i % 5)},
+        }
+    )
+
+
+async def _negotiated_extensions(server: WindowsAgentServer, path: str) -> str | None:
+    async with server.serve() as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        async with connect(f"ws://127.0.0.1:{port}{path}") as ws:
+            return ws.response.headers.get("Sec-WebSocket-Extensions")
+
+
+def test_input_channel_skips_compression_by_default(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    assert asyncio.run(_negotiated_extensions(server, "/")) is None
+    assert asyncio.run(_negotiated_extensions(server, "/input")) is None
+
+
+def test_bulk_channel_negotiates_compression_by_default(tmp_path: Path) -> None:
+    server = _server(tmp_path)
+    extensions = asyncio.run(_negotiated_extensions(server, "/status"))
+    assert extensions is not None
+    assert "permessage-deflate" in extensions
+
+
+def test_input_channel_compression_can_be_enabled(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_compress_input=True, ws_compress_bulk=False)
+    assert "permessage-deflate" in asyncio.run(_negotiated_extensions(server, "/input"))
+    assert asyncio.run(_negotiated_extensions(server, "/bulk")) is None
+
+
+def test_oversized_frame_closes_connection(tmp_path: Path) -> None:
+    server = _server(tmp_path, ws_max_message_bytes=1024)
+
+    async def run_test() -> int | None:
+        async with server.serve() as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}/") as ws:
+                await ws.send("x" * 4096)
+                await ws.wait_closed()
+                return ws.close_code
+
+    assert asyncio.run(run_test()) == 1009
+
+
+async def _bench(server: WindowsAgentServer, path: str) -> tuple[float, float]:
+    async with server.serve() as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        async with connect(f"ws://127.0.0.1:{port}{path}", compression="deflate") as ws:
+            latencies = []
+            cpu_start = time.process_time()
+            for i in range(BENCH_FRAMES):
+                sent = time.perf_counter()
+                await ws.send(_move_frame(i))
+                await ws.recv()
+                latencies.append(time.perf_counter() - sent)
+            cpu = time.process_time() - cpu_start
+    return cpu, statistics.median(latencies)
+
+
+def test_benchmark_compression_cpu_and_latency(tmp_path: Path) -> None:
+    off = _server(tmp_path / "off")
+    on = _server(tmp_path / "on", ws_compress_input=True)
+
+    cpu_off, latency_off = asyncio.run(_bench(off, "/input"))
+    cpu_on, latency_on = asyncio.run(_bench(on, "/input"))
+
+    print(
+        f"\ncompression off: cpu={cpu_off * 1000:.1f}ms p50={latency_off * 1e6:.0f}us"
+        f"\ncompression on:  cpu={cpu_on * 1000:.1f}ms p50={latency_on * 1e6:.0f}us"
+    )
+    assert len(off.input_controller.moves) == BENCH_FRAMES
+    assert len(on.input_controller.moves) == BENCH_FRAMES